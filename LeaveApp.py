@@ -6,19 +6,44 @@
 """
 
 import time
-import ntplib
+STARTUP_TIMES = {"begin": time.perf_counter()}
+
 from datetime import datetime, timedelta
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 import sys
 import os
 import subprocess
+import argparse
+import json
+import re
+import hashlib
+import gc
+import threading
+import heapq
+import http.client
+import socket
+import tempfile
+from collections import namedtuple, deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlencode
+
+# Selenium、webdriver-manager 與 ntplib 載入很慢，延後到真正需要時才載入
+# （見 load_browser_modules / load_ntp_module），讓主選單與使用手冊立即出現
+webdriver = None
+By = None
+WebDriverWait = None
+Options = None
+Service = None
+StaleElementReferenceException = None
+TimeoutException = None
+ChromeDriverManager = None
+ntplib = None
+asyncio = None
+
+STARTUP_TIMES["imports"] = time.perf_counter()
+
+# 延後載入的模組耗時：(模組名稱, 毫秒)
+IMPORT_TIMINGS = []
 
 # ==================== 固定設定 ====================
 # 表單網址
@@ -35,11 +60,306 @@ FIXED_DATA = {
     "長假號碼牌": "",
 }
 
+# 表單欄位填寫順序
+FORM_FIELDS = ["姓名", "員工代號", "近假長假類型", "假別", "起始日期", "結束日期", "確認勾選", "請假密碼"]
+
+# 欄位顯示名稱
+FIELD_LABELS = {
+    "姓名": "姓名",
+    "員工代號": "員工代號",
+    "近假長假類型": "請假類型",
+    "假別": "假別",
+    "假別選項": "特休選項",
+    "起始日期": "起始日期",
+    "結束日期": "結束日期",
+    "確認勾選": "確認勾選",
+    "請假密碼": "密碼",
+}
+
+# 非必填欄位（找不到時只提示，不中止）
+OPTIONAL_FIELDS = ["確認勾選"]
+
+# 各欄位的候選 XPath（每一輪輪詢會依序檢查全部選擇器）
+FIELD_SELECTORS = {
+    "姓名": [
+        "//input[@type='text' and contains(@aria-label, '姓名')]",
+        "//input[@type='text'][1]",
+        "//div[@role='listitem'][1]//input[@type='text']",
+    ],
+    "員工代號": [
+        "//input[@type='text' and contains(@aria-label, '員工代號')]",
+        "//input[@type='text'][2]",
+        "//div[@role='listitem'][2]//input[@type='text']",
+    ],
+    "近假長假類型": [
+        "//span[contains(text(), '近假')]/ancestor::div[@role='radio']",
+        "//div[@role='radio']//span[text()='近假']/..",
+        "//div[@role='radiogroup']//div[@role='radio'][1]",
+    ],
+    "假別": [
+        "//div[@role='listbox']",
+        "//div[@role='combobox']",
+        "//select",
+    ],
+    "假別選項": [
+        "//span[contains(text(), '特休')]/ancestor::div[@role='option']",
+        "//div[@role='option']//span[text()='特休']/..",
+        "//div[@role='option' and contains(., '特休')]",
+    ],
+    "起始日期": [
+        "//input[@type='date' and contains(@aria-label, '起點')]",
+        "//input[@type='date'][1]",
+        "//input[@type='date']",
+    ],
+    "結束日期": [
+        "//input[@type='date' and contains(@aria-label, '終點')]",
+        "//input[@type='date'][2]",
+        "(//input[@type='date'])[2]",
+    ],
+    "確認勾選": [
+        "//span[contains(text(), '我確認了')]/ancestor::div[@role='checkbox']",
+        "//div[@role='checkbox']//span[contains(text(), '我確認了')]/..",
+        "//div[@role='checkbox']",
+    ],
+    "請假密碼": [
+        "//input[@type='password']",
+        "//input[contains(@aria-label, '密碼')]",
+        "//input[@type='password' or @type='text'][last()]",
+    ],
+}
+
+# 填寫方式："batch" 以單一腳本一次填寫全部欄位，失敗的欄位再逐欄補填；
+# "field" 逐欄填寫
+FILL_MODE = "batch"
+
+# 待命模式：表單提早填好後，於送出前這些秒數重新檢查頁面並快速重填
+# （避免長時間等待後頁面失效）；設為空列表則不重填
+STANDBY_REFILL_OFFSETS = [300, 30]
+
+# 送出前幾秒以單一腳本讀回全部欄位並與應填的值比對，以及重填不符欄位的時間預算（秒）
+READBACK_BEFORE = 6
+READBACK_REFILL_BUDGET = 2
+
+# 條件等待：欄位出現的最長等待秒數、非必填欄位的等待秒數、
+# 點選後確認狀態的等待秒數，以及輪詢間隔
+FIELD_WAIT_TIMEOUT = 20
+OPTIONAL_FIELD_TIMEOUT = 3
+FIELD_CONFIRM_TIMEOUT = 3
+FIELD_POLL_INTERVAL = 0.05
+
 # 台灣 NTP 伺服器
 NTP_SERVER = "time.stdtime.gov.tw"
 
+# NTP 伺服器池（平行查詢，取延遲最低者），可用 "主機:連接埠" 指定連接埠
+NTP_SERVERS = [
+    NTP_SERVER,
+    "tock.stdtime.gov.tw",
+    "watch.stdtime.gov.tw",
+    "clock.stdtime.gov.tw",
+    "tick.stdtime.gov.tw",
+]
+
+# 精確計時：距離送出多久前由 sleep 改為忙碌等待（秒）
+SPIN_GUARD_BAND = 0.02
+
+# 單次 NTP 查詢逾時（秒）
+NTP_TIMEOUT = 0.5
+
+# 與多數伺服器偏移量差距超過此值（秒）的樣本視為離群值
+NTP_OUTLIER_THRESHOLD = 0.05
+
+# 時鐘同步：每次同步的 NTP 取樣次數，以及保留延遲最低的樣本數
+NTP_SAMPLES = 8
+NTP_KEEP_SAMPLES = 3
+
+# 長時間等待：剩餘秒數超過 N 時每 M 秒重新同步時鐘一次 [(N, M), ...]，越接近送出越頻繁；
+# 睡眠前後本機時間與單調時鐘差距超過此秒數時，視為系統休眠或系統時間被調整
+RESYNC_SCHEDULE = [(3600, 1800), (600, 300), (60, 120)]
+SUSPEND_THRESHOLD = 2
+
+# 送出方式："http" 直接送出 POST 請求，"selenium" 由瀏覽器點擊送出按鈕
+# HTTP 送出失敗時會自動改用瀏覽器送出
+SUBMIT_ENGINE = "http"
+
+# 送出失敗時的快速重試：第一次送出後 N 秒內仍可重試，每次重試前依序等待下列秒數（用完沿用最後一個）；
+# 瀏覽器點擊後超過 SUBMIT_REQUEST_TIMEOUT 秒仍未發出請求，視為點擊沒有作用
+SUBMIT_RETRY_BUDGET = 2.0
+SUBMIT_RETRY_BACKOFF = [0, 0.02, 0.05, 0.1, 0.2]
+SUBMIT_REQUEST_TIMEOUT = 0.5
+
+# 送出按鈕的候選 XPath（命中的選擇器記錄在選擇器快取）
+SUBMIT_BUTTON_SELECTORS = [
+    "//span[contains(text(), '提交') or contains(text(), '送出')]/ancestor::div[@role='button']",
+    "//div[@role='button' and (contains(., '提交') or contains(., '送出'))]",
+]
+
+# 表單各欄位的 entry ID（留空時自動取自表單結構 FB_PUBLIC_LOAD_DATA_，
+# 有填寫的以此為準）；必填欄位皆取得後才會啟用 HTTP 送出，否則使用瀏覽器送出
+FORM_ENTRY_IDS = {
+    "姓名": "",
+    "員工代號": "",
+    "近假長假類型": "",
+    "假別": "",
+    "起始日期": "",
+    "結束日期": "",
+    "確認勾選": "",
+    "請假密碼": "",
+    "補充事項": "",
+    "長假號碼牌": "",
+}
+
+# HTTP 送出時必須具備 entry ID 的欄位
+REQUIRED_ENTRY_FIELDS = ["姓名", "員工代號", "近假長假類型", "假別", "起始日期", "結束日期", "請假密碼"]
+
+# 確認勾選框的選項文字（HTTP 送出時需與表單選項完全一致）
+CONFIRM_CHECKBOX_TEXT = "我確認了"
+
+# 送出成功頁面的提示文字
+SUCCESS_MARKERS = ["已記錄您的回應", "您的回應已記錄"]
+
+# 送出後等待伺服器回應的最長秒數，以及要記錄的伺服器時間相關標頭
+CONFIRM_TIMEOUT = 10
+SERVER_TIMING_HEADERS = ["date", "server-timing", "x-request-time"]
+
+# 網路延遲補償：送出前量測到表單主機的往返延遲，提前送出最低往返延遲的一半（單程延遲）；
+# 量測對象為靜態資源，避免把伺服器產生表單頁面的時間算進網路延遲而過早送出
+LATENCY_COMPENSATION = True
+LATENCY_SAMPLES = 10
+LATENCY_PROBE_PATH = "/favicon.ico"
+LATENCY_MAX_LEAD = 0.5   # 提前量上限（秒），避免量測異常時過早送出
+
+# 連線保溫：等待期間每隔幾秒送一次輕量請求，並於送出前幾秒檢查連線
+KEEPALIVE_INTERVAL = 20
+HEALTH_CHECK_BEFORE = 3
+
+# 關鍵時段：送出前幾秒起暫停垃圾回收、提高行程與執行緒優先權，
+# 倒數改由背景執行緒每隔 COUNTDOWN_RENDER_INTERVAL 秒顯示一次；設為 0 則停用
+CRITICAL_WINDOW_BEFORE = 2
+COUNTDOWN_RENDER_INTERVAL = 0.2
+
+# 送出前的連線檢查與讀回驗證，最晚須在交給觸發執行緒前幾秒結束（作為這些工作的逾時）；
+# 觸發執行緒整理瀏覽器時，距離觸發不到此秒數也會略過
+FIRE_PREPARE_MARGIN = 0.5
+
+# 等待與送出改由 asyncio 事件迴圈同時協調時鐘同步、保溫、待命重填與倒數（False 則依序執行）
+ASYNC_ORCHESTRATOR = True
+
+# 快取與執行紀錄存放位置
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".leave_app")
+RUN_LOG_PATH = os.path.join(DATA_DIR, "run_log.jsonl")
+SELECTOR_CACHE_PATH = os.path.join(DATA_DIR, "selector_cache.json")
+FORM_SCHEMA_PATH = os.path.join(DATA_DIR, "form_schema.json")
+DRIVER_CACHE_PATH = os.path.join(DATA_DIR, "driver_cache.json")
+LATENCY_PROFILE_PATH = os.path.join(DATA_DIR, "latency_profile.json")
+TELEMETRY_DIR = os.path.join(DATA_DIR, "runs")   # 每次執行的各階段耗時（JSONL）
+DIAGNOSTICS_DIR = os.path.join(DATA_DIR, "diagnostics")   # 每次執行的截圖、頁面原始碼與事件紀錄
+
+# 事件緩衝區保留的最近事件筆數（只存在記憶體，寫入事後分析資料時才輸出）；
+# 等待期間保存事後分析資料時，最多等幾秒讓背景執行緒用完瀏覽器再繼續
+EVENT_BUFFER_SIZE = 4096
+DIAGNOSTICS_WAIT_TIMEOUT = 5
+
+# 精簡瀏覽器模式：無頭執行、不放大視窗、封鎖圖片／字型／影音等非必要資源，
+# 並使用固定的使用者資料夾讓快取在多次執行間保留
+LEAN_BROWSER = False
+HEADLESS_MODE = "new"   # "new"、"old"，或 "" 表示保留視窗
+LEAN_USER_DATA_DIR = os.path.join(DATA_DIR, "chrome_profile")   # 設為 "" 則每次使用全新設定檔
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*fonts.gstatic.com*",
+    "*.mp4", "*.webm", "*.mp3", "*.ogg",
+]
+
+# 讀取本機 Chrome 版本的登錄機碼（Windows）與執行檔名稱（其他平台）
+CHROME_VERSION_REG_KEYS = [
+    r"HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon",
+    r"HKEY_LOCAL_MACHINE\Software\Google\Chrome\BLBeacon",
+    r"HKEY_LOCAL_MACHINE\Software\WOW6432Node\Google\Chrome\BLBeacon",
+]
+CHROME_BINARIES = ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser"]
+
+# 批次模式：每筆送出在目標時間前幾秒才開啟並填寫表單（沒有預演的效能設定檔時）
+BATCH_PREPARE_BEFORE = 120
+
+# 本機模擬表單（效能測試用）：每個請求注入的單程延遲與抖動（毫秒），
+# 以及每輪測試的送出時間設在填寫完成後幾秒
+MOCK_LATENCY_MS = 20
+MOCK_JITTER_MS = 5
+E2E_TARGET_DELAY = 5
+
+# 預演（--rehearse）的次數；依預演結果決定開始準備的時間時，
+# 以 p95 耗時乘上安全係數，且至少提前 PREPARE_MIN_SECONDS 秒
+REHEARSAL_RUNS = 4
+PREPARE_SAFETY_FACTOR = 3
+PREPARE_MIN_SECONDS = 90
+
+# 單次 NTP 取樣結果：伺服器、偏移量（秒）、往返延遲（秒）
+NtpSample = namedtuple("NtpSample", ["server", "offset", "delay"])
+
 # ==================== 功能函數 ====================
 
+@contextmanager
+def timed_import(module_name):
+    """記錄 with 區塊內 import 敘述的耗時
+
+    延後載入的模組仍須以靜態的 import 敘述載入（不可用 importlib 依字串載入），
+    PyInstaller 才分析得到並打包進執行檔
+    """
+    start = time.perf_counter()
+    yield
+    IMPORT_TIMINGS.append((module_name, (time.perf_counter() - start) * 1000))
+
+def load_browser_modules():
+    """載入 Selenium 與 webdriver-manager（只在第一次呼叫時實際載入）"""
+    global webdriver, By, WebDriverWait, Options, Service
+    global StaleElementReferenceException, TimeoutException, ChromeDriverManager
+    if webdriver is not None:
+        return
+
+    with timed_import("selenium.common.exceptions"):
+        from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+    with timed_import("selenium.webdriver.common.by"):
+        from selenium.webdriver.common.by import By
+    with timed_import("selenium.webdriver.support.ui"):
+        from selenium.webdriver.support.ui import WebDriverWait
+    with timed_import("selenium.webdriver.chrome.options"):
+        from selenium.webdriver.chrome.options import Options
+    with timed_import("selenium.webdriver.chrome.service"):
+        from selenium.webdriver.chrome.service import Service
+    with timed_import("webdriver_manager.chrome"):
+        from webdriver_manager.chrome import ChromeDriverManager
+    with timed_import("selenium.webdriver"):
+        from selenium import webdriver
+
+def load_ntp_module():
+    """載入 ntplib（只在第一次呼叫時實際載入）"""
+    global ntplib
+    if ntplib is None:
+        with timed_import("ntplib"):
+            import ntplib
+
+def load_async_module():
+    """載入 asyncio（只在第一次呼叫時實際載入）"""
+    global asyncio
+    if asyncio is None:
+        with timed_import("asyncio"):
+            import asyncio
+
+def startup_profile():
+    """顯示啟動耗時：到主選單的時間，以及延後載入的各套件耗時"""
+    to_menu_ms = (time.perf_counter() - STARTUP_TIMES["begin"]) * 1000
+    imports_ms = (STARTUP_TIMES["imports"] - STARTUP_TIMES["begin"]) * 1000
+    print("[啟動] 啟動耗時分析")
+    print(f"  標準函式庫載入：{imports_ms:8.1f} ms")
+    print(f"  到主選單：      {to_menu_ms:8.1f} ms")
+
+    load_ntp_module()
+    load_browser_modules()
+    print("[啟動] 延後載入的套件（執行請假程式時才載入）：")
+    for module_name, elapsed_ms in IMPORT_TIMINGS:
+        print(f"  {module_name:<40}{elapsed_ms:8.1f} ms")
+    print(f"  {'合計':<38}{sum(ms for _, ms in IMPORT_TIMINGS):8.1f} ms")
+
 def show_manual():
     """顯示使用手冊"""
     manual_path = os.path.join(os.path.dirname(__file__), "Manual.txt")
@@ -73,36 +393,189 @@ def show_menu():
     choice = input("請輸入選項 (1/2/3) > ").strip()
     return choice
 
-def get_ntp_time():
-    """從國家標準時間伺服器獲取精確時間"""
+def parse_ntp_server(server, default_port=123):
+    """解析 "主機" 或 "主機:連接埠" 格式的 NTP 伺服器設定"""
+    host, sep, port = server.rpartition(':')
+    if sep and port.isdigit():
+        return host, int(port)
+    return server, default_port
+
+def query_ntp_server(server, timeout=NTP_TIMEOUT, default_port=123):
+    """向單一 NTP 伺服器取樣一次，失敗時回傳 None"""
+    host, port = parse_ntp_server(server, default_port)
     try:
-        client = ntplib.NTPClient()
-        response = client.request(NTP_SERVER, version=3, timeout=5)
-        ntp_time = datetime.fromtimestamp(response.tx_time)
-        return ntp_time, True
-    except Exception as e:
-        print(f"[警告] 無法連接到 NTP 伺服器: {e}")
-        print("[警告] 將使用系統時間，可能不夠精確")
-        return datetime.now(), False
+        response = ntplib.NTPClient().request(host, version=3, port=port, timeout=timeout)
+    except Exception:
+        return None
+    return NtpSample(server, response.offset, response.delay)
+
+def query_ntp_servers(servers=None, timeout=NTP_TIMEOUT, default_port=123):
+    """同時向多台 NTP 伺服器取樣，回傳成功的樣本列表
+
+    各伺服器平行查詢，任何一台無回應最多只拖延 timeout 秒
+    """
+    if servers is None:
+        servers = NTP_SERVERS
+    if not servers:
+        return []
+    load_ntp_module()
+    with ThreadPoolExecutor(max_workers=len(servers)) as executor:
+        results = executor.map(lambda server: query_ntp_server(server, timeout, default_port), servers)
+        return [sample for sample in results if sample is not None]
+
+def reject_ntp_outliers(samples):
+    """剔除偏移量明顯偏離多數樣本的伺服器回應"""
+    if len(samples) < 3:
+        return list(samples)
+    offsets = sorted(sample.offset for sample in samples)
+    median = offsets[len(offsets) // 2]
+    deviations = sorted(abs(offset - median) for offset in offsets)
+    mad = deviations[len(deviations) // 2]
+    threshold = max(3 * mad, NTP_OUTLIER_THRESHOLD)
+    return [sample for sample in samples if abs(sample.offset - median) <= threshold]
+
+def select_best_ntp_samples(samples, keep=NTP_KEEP_SAMPLES):
+    """剔除離群值後，依往返延遲由低到高選出最多 keep 個樣本；無樣本時回傳空列表"""
+    return sorted(reject_ntp_outliers(samples), key=lambda sample: sample.delay)[:keep]
+
+class ClockSync:
+    """以多次 NTP 取樣建立的時鐘偏移模型
+
+    同步時平行查詢多台伺服器數輪，剔除離群值後保留往返延遲最低的樣本估算偏移量；
+    之後以 time.perf_counter_ns() 推算伺服器時間，查詢時不需任何網路 I/O。
+    """
+
+    # 本機石英振盪器漂移的保守估計（每秒誤差秒數）
+    DRIFT_RATE = 50e-6
+
+    def __init__(self, servers=None, port=123, samples=NTP_SAMPLES,
+                 keep=NTP_KEEP_SAMPLES, timeout=NTP_TIMEOUT):
+        self.servers = list(servers) if servers is not None else list(NTP_SERVERS)
+        self.port = port
+        self.samples = samples
+        self.keep = keep
+        self.timeout = timeout
+        self.is_ntp = False
+        self.server = None       # 延遲最低的伺服器
+        self.offset = 0.0        # 伺服器時間 - 本機時間（秒）
+        self.delay = None        # 採用樣本中最低的往返延遲（秒）
+        self.spread = 0.0        # 採用樣本間偏移量的最大差距（秒）
+        self.last_drift = None   # 上次同步時，新模型與舊模型推算時間的差距（秒）
+        self._anchor_wall_ns = time.time_ns()
+        self._anchor_perf_ns = time.perf_counter_ns()
+
+    def sync(self):
+        """向 NTP 伺服器取樣並更新偏移模型，回傳是否同步成功"""
+        with TELEMETRY.span("ntp.sync", servers=len(self.servers)) as meta:
+            synced = self._sync()
+            meta.update(server=self.server, offset_ms=round(self.offset * 1000, 3), is_ntp=self.is_ntp)
+        return synced
+
+    def _sync(self):
+        """實際的取樣與模型更新（見 sync）"""
+        results = []
+        servers = self.servers
+        for round_index in range(self.samples):
+            round_samples = query_ntp_servers(servers, self.timeout, self.port)
+            results.extend(round_samples)
+            if round_index == 0:
+                # 之後只查詢第一輪有回應的伺服器；全部失敗就不再重試，避免在網路斷線時空等
+                servers = [sample.server for sample in round_samples]
+                if not servers:
+                    break
+
+        # 保留往返延遲最低的樣本，取其偏移量的中位數
+        best = select_best_ntp_samples(results, self.keep)
+        if not best and self.is_ntp:
+            # 已有同步結果時，暫時的網路問題不應讓時鐘退回系統時間
+            print("[警告] 重新同步失敗，沿用先前的同步結果")
+            self.last_drift = None
+            return False
+        if not best:
+            print(f"[警告] 無法連接到任何 NTP 伺服器: {', '.join(self.servers)}")
+            print("[警告] 將使用系統時間，可能不夠精確")
+            self.server = None
+            self._set_model(0.0, None, 0.0, is_ntp=False)
+            return False
+
+        offsets = sorted(sample.offset for sample in best)
+        offset = offsets[len(offsets) // 2]
+        spread = offsets[-1] - offsets[0]
+        self.server = best[0].server
+        self._set_model(offset, best[0].delay, spread, is_ntp=True)
+        return True
+
+    def _set_model(self, offset, delay, spread, is_ntp):
+        """更新偏移量並重設本機時鐘錨點，並記錄與舊模型的差距"""
+        anchor_perf_ns = time.perf_counter_ns()
+        anchor_wall_ns = time.time_ns()
+        if self.is_ntp and is_ntp:
+            predicted_ns = self._anchor_wall_ns + int(self.offset * 1e9) + (anchor_perf_ns - self._anchor_perf_ns)
+            self.last_drift = (anchor_wall_ns + int(offset * 1e9) - predicted_ns) / 1e9
+        else:
+            self.last_drift = None
+        self.offset = offset
+        self.delay = delay
+        self.spread = spread
+        self.is_ntp = is_ntp
+        self._anchor_perf_ns = anchor_perf_ns
+        self._anchor_wall_ns = anchor_wall_ns
+
+    def reanchor(self):
+        """保留偏移量，以目前的系統時間重設錨點
+
+        系統休眠期間單調時鐘可能停止計數，喚醒後舊錨點推算的時間會落後
+        """
+        self._anchor_perf_ns = time.perf_counter_ns()
+        self._anchor_wall_ns = time.time_ns()
+
+    def now_ns(self):
+        """伺服器時間（epoch 奈秒），不需網路 I/O"""
+        elapsed_ns = time.perf_counter_ns() - self._anchor_perf_ns
+        return self._anchor_wall_ns + int(self.offset * 1e9) + elapsed_ns
+
+    def now(self):
+        """伺服器時間（datetime），不需網路 I/O"""
+        return datetime.fromtimestamp(self.now_ns() / 1e9)
+
+    def seconds_until(self, target_time):
+        """距離目標時間（伺服器時間）還有幾秒"""
+        return target_time.timestamp() - self.now_ns() / 1e9
+
+    def deadline_ns(self, target_time):
+        """目標時間（伺服器時間）換算成 time.perf_counter_ns() 時間軸上的時刻"""
+        target_ns = int(round(target_time.timestamp() * 1e9))
+        return self._anchor_perf_ns + (target_ns - self._anchor_wall_ns - int(self.offset * 1e9))
+
+    def error_bound(self):
+        """目前時間估計的誤差上限（秒），未同步時回傳 None"""
+        if not self.is_ntp:
+            return None
+        elapsed = (time.perf_counter_ns() - self._anchor_perf_ns) / 1e9
+        return self.delay / 2 + self.spread + elapsed * self.DRIFT_RATE
 
 def parse_target_time(time_str):
     """解析目標時間字串
     格式: YYYY-MM-DD HH:MM:SS.sss
     例如: 2025-12-25 09:59:59.999
+    小數部分是秒的小數（最多 6 位），例如 .9 與 .900 都是 900 毫秒
     """
     try:
-        # 分離日期時間和毫秒
+        # 分離日期時間和秒的小數部分
         if '.' in time_str:
-            dt_part, ms_part = time_str.rsplit('.', 1)
-            ms = int(ms_part)
+            dt_part, fraction = time_str.rsplit('.', 1)
+            fraction = fraction.strip()
+            if not fraction.isdigit() or len(fraction) > 6:
+                raise ValueError(f"秒的小數部分 '{fraction}' 應為 1 到 6 位數字")
+            microsecond = int(fraction.ljust(6, '0'))
         else:
             dt_part = time_str
-            ms = 0
+            microsecond = 0
 
         # 解析日期時間
         target_dt = datetime.strptime(dt_part.strip(), "%Y-%m-%d %H:%M:%S")
-        # 加上毫秒
-        target_dt = target_dt.replace(microsecond=ms * 1000)
+        # 加上秒的小數部分
+        target_dt = target_dt.replace(microsecond=microsecond)
 
         return target_dt
     except ValueError as e:
@@ -165,11 +638,75 @@ def confirm_info(target_time, start_date, end_date):
     confirm = input("\n確認以上資訊正確？(Y/N) > ").strip().upper()
     return confirm == 'Y'
 
-def setup_driver():
-    """設定 Chrome WebDriver"""
-    print("\n[初始化] 正在啟動瀏覽器...")
-    print("[提示] 首次執行會下載 ChromeDriver，請稍候...")
-    
+def detect_chrome_version():
+    """不經網路讀取本機 Chrome 版本，無法取得時回傳 None"""
+    if sys.platform == "win32":
+        for key in CHROME_VERSION_REG_KEYS:
+            try:
+                output = subprocess.run(["reg", "query", key, "/v", "version"],
+                                        capture_output=True, text=True, timeout=5).stdout
+            except (OSError, subprocess.SubprocessError):
+                continue
+            match = re.search(r"version\s+REG_SZ\s+([\d.]+)", output)
+            if match:
+                return match.group(1)
+        return None
+
+    for binary in CHROME_BINARIES:
+        try:
+            output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=5).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        match = re.search(r"(\d+\.\d+\.\d+\.\d+)", output)
+        if match:
+            return match.group(1)
+    return None
+
+def resolve_chromedriver(chrome_version, refresh=False):
+    """取得 ChromeDriver 路徑，回傳 (路徑, 是否沿用快取)
+
+    快取記錄的 Chrome 主版本與目前相同、且驅動程式檔案仍在時直接沿用，不需網路；
+    否則交由 webdriver-manager 安裝並更新快取。refresh 為 True 時先作廢快取再安裝。
+    """
+    if refresh:
+        try:
+            os.remove(DRIVER_CACHE_PATH)
+        except OSError:
+            pass
+    cache = load_json_file(DRIVER_CACHE_PATH)
+    cached_path = cache.get("driver_path")
+    cached_version = cache.get("chrome_version")
+
+    if cached_path and os.path.exists(cached_path):
+        if chrome_version is None or (
+                cached_version and cached_version.split('.')[0] == chrome_version.split('.')[0]):
+            return cached_path, True
+
+    driver_path = ChromeDriverManager().install()
+    save_json_file(DRIVER_CACHE_PATH, {
+        "chrome_version": chrome_version,
+        "driver_path": driver_path,
+        "updated": datetime.now().isoformat(timespec='seconds'),
+    })
+    return driver_path, False
+
+def setup_driver(lean=None):
+    """設定 Chrome WebDriver
+
+    lean 為 True 時使用精簡模式（見 LEAN_BROWSER），未指定時依設定
+    """
+    if lean is None:
+        lean = LEAN_BROWSER
+    with TELEMETRY.span("setup_driver", lean=lean):
+        return _setup_driver(lean)
+
+def _setup_driver(lean):
+    """啟動 Chrome 並套用選項（見 setup_driver）"""
+    print("\n[初始化] 正在啟動瀏覽器" + ("（精簡模式）..." if lean else "..."))
+    phase_start = time.perf_counter()
+    load_browser_modules()
+    timings = [("載入 Selenium", (time.perf_counter() - phase_start) * 1000)]
+
     options = Options()
     options.add_argument('--disable-gpu')
     options.add_argument('--no-sandbox')
@@ -177,315 +714,1833 @@ def setup_driver():
     options.add_argument('--disable-blink-features=AutomationControlled')
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
+    # 開啟 DevTools 網路事件紀錄，用來觀察送出的回應
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    if lean:
+        if HEADLESS_MODE == "new":
+            options.add_argument('--headless=new')
+        elif HEADLESS_MODE == "old":
+            options.add_argument('--headless')
+        options.add_argument('--window-size=1280,2000')
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        if LEAN_USER_DATA_DIR:
+            options.add_argument(f'--user-data-dir={LEAN_USER_DATA_DIR}')
 
     try:
-        # 使用 webdriver-manager 自動下載並管理 ChromeDriver
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.maximize_window()
+        phase_start = time.perf_counter()
+        chrome_version = detect_chrome_version()
+        timings.append(("偵測 Chrome 版本", (time.perf_counter() - phase_start) * 1000))
+
+        # 版本相符時沿用快取的 ChromeDriver，否則由 webdriver-manager 下載
+        phase_start = time.perf_counter()
+        cached = False
+        try:
+            driver_path, cached = resolve_chromedriver(chrome_version)
+            service = Service(driver_path)
+            if not cached:
+                print(f"[提示] 已下載 ChromeDriver（Chrome {chrome_version or '版本未知'}）")
+        except Exception as e:
+            # 離線且沒有可用快取時，交給 Selenium 內建的驅動程式管理
+            print(f"[警告] 無法取得 ChromeDriver: {e}，改用 Selenium 內建管理")
+            service = Service()
+        timings.append(("解析 ChromeDriver", (time.perf_counter() - phase_start) * 1000))
+
+        phase_start = time.perf_counter()
+        try:
+            driver = webdriver.Chrome(service=service, options=options)
+        except Exception as e:
+            if not cached:
+                raise
+            # 快取的驅動程式可能已與 Chrome 版本不符（例如 Chrome 自動更新且偵測不到版本），
+            # 作廢快取並重新安裝後再試一次
+            print(f"[警告] 以快取的 ChromeDriver 啟動失敗: {e}")
+            print("[提示] 清除 ChromeDriver 快取，重新下載後再試一次...")
+            driver_path, _ = resolve_chromedriver(chrome_version, refresh=True)
+            driver = webdriver.Chrome(service=Service(driver_path), options=options)
+        if lean:
+            # 以 DevTools 封鎖非必要資源
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        else:
+            driver.maximize_window()
+        timings.append(("啟動瀏覽器", (time.perf_counter() - phase_start) * 1000))
+
         print("[成功] 瀏覽器已啟動")
+        print("[耗時] " + "，".join(f"{label} {elapsed_ms:.0f} ms" for label, elapsed_ms in timings))
         return driver
     except Exception as e:
         print(f"[錯誤] 無法啟動 Chrome: {e}")
         print("[提示] 請確認已安裝 Chrome 瀏覽器")
         raise
 
-def fill_form(driver, start_date, end_date):
-    """填寫表單（不送出）"""
-    print("\n[處理中] 正在開啟表單...")
-    driver.get(FORM_URL)
-
-    wait = WebDriverWait(driver, 20)  # 增加等待時間到 20 秒
+def browser_process_rss(driver):
+    """瀏覽器行程樹（含所有子行程）的實體記憶體（MB），沒有 psutil 或量測失敗時回傳 None
 
+    只讀取行程資訊、不經過 WebDriver，可以在其他執行緒與頁面載入同時呼叫
+    """
     try:
-        print("[處理中] 正在填寫表單...")
+        import psutil
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass   # 載入期間子行程可能隨時結束
+        return total / 1024 / 1024
+    except Exception:
+        return None
 
-        # 等待表單載入
-        print("[等待] 等待表單完全載入...")
-        time.sleep(5)  # 增加等待時間
-
-        # 1. 姓名 - 使用更通用的選擇器
-        print("[處理中] 填寫姓名...")
-        try:
-            # 嘗試多種選擇器
-            name_input = None
-            selectors = [
-                "//input[@type='text' and contains(@aria-label, '姓名')]",
-                "//input[@type='text'][1]",
-                "//div[@role='listitem'][1]//input[@type='text']"
-            ]
-            for selector in selectors:
-                try:
-                    name_input = wait.until(EC.presence_of_element_located((By.XPATH, selector)))
-                    if name_input:
-                        break
-                except:
-                    continue
+def measure_browser_memory(driver):
+    """瀏覽器（含所有子行程）目前使用的記憶體（MB）
 
-            if name_input:
-                name_input.clear()
-                time.sleep(0.5)
-                name_input.send_keys(FIXED_DATA['姓名'])
-                print(f"  ✓ 姓名: {FIXED_DATA['姓名']}")
-            else:
-                raise Exception("找不到姓名欄位")
-        except Exception as e:
-            print(f"  ✗ 姓名填寫失敗: {e}")
-            raise
+    有安裝 psutil 時量測整個行程樹的實體記憶體；否則以頁面的 JS heap 近似
+    """
+    rss = browser_process_rss(driver)
+    if rss is not None:
+        return rss, "RSS"
 
-        # 2. 員工代號
-        print("[處理中] 填寫員工代號...")
-        try:
-            emp_selectors = [
-                "//input[@type='text' and contains(@aria-label, '員工代號')]",
-                "//input[@type='text'][2]",
-                "//div[@role='listitem'][2]//input[@type='text']"
-            ]
-            emp_id_input = None
-            for selector in emp_selectors:
-                try:
-                    emp_id_input = driver.find_element(By.XPATH, selector)
-                    if emp_id_input:
-                        break
-                except:
-                    continue
+    metrics = driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+    heap = next((metric["value"] for metric in metrics if metric["name"] == "JSHeapTotalSize"), 0)
+    return heap / 1024 / 1024, "JS heap"
 
-            if emp_id_input:
-                emp_id_input.clear()
-                time.sleep(0.5)
-                emp_id_input.send_keys(FIXED_DATA['員工代號'])
-                print(f"  ✓ 員工代號: {FIXED_DATA['員工代號']}")
-            else:
-                raise Exception("找不到員工代號欄位")
-        except Exception as e:
-            print(f"  ✗ 員工代號填寫失敗: {e}")
-            raise
+class MemoryPeakSampler:
+    """頁面載入期間在背景定期量測瀏覽器行程樹的記憶體並記錄峰值
 
-        # 3. 近假/長假 (單選題)
-        print("[處理中] 選擇請假類型...")
-        try:
-            radio_selectors = [
-                "//span[contains(text(), '近假')]/ancestor::div[@role='radio']",
-                "//div[@role='radio']//span[text()='近假']/..",
-                "//div[@role='radiogroup']//div[@role='radio'][1]"
-            ]
-            radio_option = None
-            for selector in radio_selectors:
+    記憶體高點通常出現在載入途中，就緒後才量一次會低估；
+    沒有 psutil 時無法在背景量測，peak 維持 None
+    """
+
+    def __init__(self, driver, interval=0.02):
+        self.driver = driver
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            rss = browser_process_rss(self.driver)
+            if rss is None:
+                return
+            self.peak = rss if self.peak is None else max(self.peak, rss)
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self):
+        """停止量測並回傳峰值（MB），無法量測時回傳 None"""
+        self._stop.set()
+        self._thread.join()
+        rss = browser_process_rss(self.driver)
+        if rss is not None:
+            self.peak = rss if self.peak is None else max(self.peak, rss)
+        return self.peak
+
+def benchmark_browser(runs=3, form_url=FORM_URL):
+    """比較一般模式與精簡模式的頁面就緒時間與記憶體用量
+
+    有 psutil 時記錄載入期間的記憶體峰值；否則只能在就緒後量一次（以 JS heap 近似的就緒後用量）
+    """
+    print(f"[測試] 瀏覽器設定比較（各 {runs} 次）")
+    results = {}
+    for lean in (False, True):
+        ready_times = []
+        memory_samples = []
+        memory_kind = ""
+        for _ in range(runs):
+            driver = setup_driver(lean)
+            try:
+                driver.execute_cdp_cmd("Performance.enable", {})
+                sampler = MemoryPeakSampler(driver).start()
+                start = time.perf_counter()
                 try:
-                    radio_option = driver.find_element(By.XPATH, selector)
-                    if radio_option:
-                        break
-                except:
-                    continue
+                    driver.get(form_url)
+                    find_field(driver, FORM_FIELDS[0])
+                    ready_times.append((time.perf_counter() - start) * 1000)
+                finally:
+                    peak = sampler.stop()
+                if peak is not None:
+                    memory, memory_kind = peak, "載入期間 RSS 峰值"
+                else:
+                    memory, kind = measure_browser_memory(driver)
+                    memory_kind = f"就緒後 {kind}"
+                memory_samples.append(memory)
+            finally:
+                driver.quit()
+        results["精簡模式" if lean else "一般模式"] = (ready_times, memory_samples, memory_kind)
+
+    print("\n[結果] 頁面就緒時間與記憶體用量：")
+    for label, (ready_times, memory_samples, memory_kind) in results.items():
+        print(f"  {label}：就緒 p50 {percentile(ready_times, 50):.0f} ms / "
+              f"最慢 {max(ready_times):.0f} ms，"
+              f"記憶體最高 {max(memory_samples):.0f} MB（{memory_kind}）")
+    return results
+
+def load_json_file(path):
+    """讀取 JSON 檔，不存在或損毀時回傳空字典"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_json_file(path, data):
+    """寫入 JSON 檔，失敗時只顯示警告"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"[警告] 無法寫入 {path}: {e}")
+
+class SelectorCache:
+    """記錄各欄位上次命中的選擇器（依表單網址分開存放）
+
+    下次執行時優先嘗試上次命中的選擇器；若它落空就自動作廢，改記錄新的命中結果。
+    同一次執行中可能有多個快取物件（填寫、待命重填、送出按鈕），寫回時只合併本物件變更過的欄位，
+    不會覆蓋其他物件在這之間寫入的記錄。
+    """
 
-            if radio_option:
-                driver.execute_script("arguments[0].scrollIntoView(true);", radio_option)
-                time.sleep(0.5)
-                radio_option.click()
-                print(f"  ✓ 請假類型: {FIXED_DATA['近假長假類型']}")
+    def __init__(self, form_url=FORM_URL, path=None, selectors=None):
+        self.form_url = form_url
+        self.path = path or SELECTOR_CACHE_PATH   # 呼叫時才決定，模擬執行可改寫到暫存目錄
+        self.selectors = selectors if selectors is not None else FIELD_SELECTORS
+        self.entries = load_json_file(self.path).get(form_url, {})
+        self.changes = {}        # 欄位 -> 新記錄（None 代表作廢）
+
+    def get(self, field):
+        """上次命中的選擇器，沒有記錄時回傳 None"""
+        entry = self.entries.get(field)
+        return entry["selector"] if entry else None
+
+    def ordered_selectors(self, field):
+        """候選選擇器，上次命中的排在最前面"""
+        selectors = list(self.selectors[field])
+        cached = self.get(field)
+        if cached in selectors:
+            selectors.remove(cached)
+            selectors.insert(0, cached)
+        return selectors
+
+    def record(self, field, selector, elapsed_ms):
+        """記錄命中的選擇器與定位耗時"""
+        self.entries[field] = {
+            "selector": selector,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "updated": datetime.now().isoformat(timespec='seconds'),
+        }
+        self.changes[field] = self.entries[field]
+
+    def invalidate(self, field):
+        """作廢欄位的快取記錄"""
+        if self.entries.pop(field, None) is not None:
+            self.changes[field] = None
+
+    def save(self):
+        """有變更時重新讀取快取檔，合併本物件變更過的欄位後寫回"""
+        if not self.changes:
+            return
+        data = load_json_file(self.path)
+        entries = data.setdefault(self.form_url, {})
+        for field, entry in self.changes.items():
+            if entry is None:
+                entries.pop(field, None)
             else:
-                raise Exception("找不到請假類型選項")
-        except Exception as e:
-            print(f"  ✗ 請假類型選擇失敗: {e}")
-            raise
+                entries[field] = entry
+        save_json_file(self.path, data)
+        self.changes = {}
+
+def manage_selector_cache(action):
+    """查看或清除選擇器快取"""
+    if action == "reset":
+        if os.path.exists(SELECTOR_CACHE_PATH):
+            os.remove(SELECTOR_CACHE_PATH)
+        print("[快取] 已清除選擇器快取")
+        return
 
-        # 4. 假別 (下拉選單)
-        print("[處理中] 選擇假別...")
+    data = load_json_file(SELECTOR_CACHE_PATH)
+    if not data:
+        print("[快取] 目前沒有選擇器快取")
+        return
+    for form_url, entries in data.items():
+        print(f"[快取] {form_url}")
+        for field, entry in entries.items():
+            print(f"  {FIELD_LABELS.get(field, field)}：{entry['selector']}"
+                  f"（{entry['elapsed_ms']:.0f} ms，{entry['updated']}）")
+
+def find_field(driver, field, timeout=FIELD_WAIT_TIMEOUT, cache=None):
+    """輪詢欄位的所有候選選擇器，直到任一元素出現且可互動為止
+
+    每一輪都會檢查全部選擇器，不會因前面的選擇器落空而卡住整個逾時時間；
+    有提供 cache 時先試上次命中的選擇器，並記錄這次的結果。
+    回傳 (元素, 命中的選擇器)，逾時則拋出 TimeoutException
+    """
+    selectors = cache.ordered_selectors(field) if cache else FIELD_SELECTORS[field]
+    cached = cache.get(field) if cache else None
+
+    def locate(d):
+        for selector in selectors:
+            for element in d.find_elements(By.XPATH, selector):
+                if element.is_displayed() and element.is_enabled():
+                    return element, selector
+        return False
+
+    wait = WebDriverWait(driver, timeout, poll_frequency=FIELD_POLL_INTERVAL,
+                         ignored_exceptions=(StaleElementReferenceException,))
+    start = time.perf_counter()
+    try:
+        element, selector = wait.until(locate, message=f"找不到{FIELD_LABELS[field]}欄位")
+    except TimeoutException:
+        if cache:
+            cache.invalidate(field)
+        raise
+
+    if cache:
+        if cached is not None and selector != cached:
+            cache.invalidate(field)
+        cache.record(field, selector, (time.perf_counter() - start) * 1000)
+    return element, selector
+
+def wait_for_condition(driver, condition, message, timeout=FIELD_CONFIRM_TIMEOUT):
+    """以短間隔輪詢等待條件成立"""
+    wait = WebDriverWait(driver, timeout, poll_frequency=FIELD_POLL_INTERVAL,
+                         ignored_exceptions=(StaleElementReferenceException,))
+    return wait.until(condition, message=message)
+
+def get_field_value(field, start_date, end_date):
+    """取得欄位要填入的值"""
+    if field == "起始日期":
+        return start_date
+    if field == "結束日期":
+        return end_date
+    if field == "確認勾選":
+        return True
+    return FIXED_DATA[field]
+
+def describe_field_value(field, value):
+    """欄位值的顯示文字（密碼不顯示）"""
+    if field == "請假密碼":
+        return "********"
+    if field == "確認勾選":
+        return "已勾選"
+    return value
+
+def fill_single_field(driver, field, value, timeout=FIELD_WAIT_TIMEOUT, cache=None, deadline=None):
+    """以條件等待定位並填寫單一欄位，回傳命中的選擇器
+
+    deadline 為 time.perf_counter() 時間軸上的期限，定位、選項與確認的等待都不會超過期限
+    """
+    def limit(seconds):
+        if deadline is None:
+            return seconds
+        return max(0.0, min(seconds, deadline - time.perf_counter()))
+
+    element, selector = find_field(driver, field, limit(timeout), cache)
+    driver.execute_script("arguments[0].scrollIntoView(true);", element)
+
+    if field == "近假長假類型":
+        element.click()
+        wait_for_condition(driver, lambda d: element.get_attribute('aria-checked') == 'true',
+                           f"{FIELD_LABELS[field]}未被選取", limit(FIELD_CONFIRM_TIMEOUT))
+
+    elif field == "假別":
+        element.click()
+        option, _ = find_field(driver, "假別選項", limit(timeout), cache)
+        option.click()
+        # 等待下拉選單收合，避免遮住後續欄位
         try:
-            time.sleep(1)
-            dropdown_selectors = [
-                "//div[@role='listbox']",
-                "//div[@role='combobox']",
-                "//select"
-            ]
-            dropdown = None
-            for selector in dropdown_selectors:
-                try:
-                    dropdown = driver.find_element(By.XPATH, selector)
-                    if dropdown:
-                        break
-                except:
-                    continue
+            wait_for_condition(driver, lambda d: element.get_attribute('aria-expanded') != 'true',
+                               "下拉選單未收合", limit(FIELD_CONFIRM_TIMEOUT))
+        except TimeoutException:
+            pass
 
-            if dropdown:
-                driver.execute_script("arguments[0].scrollIntoView(true);", dropdown)
-                time.sleep(0.5)
-                dropdown.click()
-                time.sleep(1)
-
-                # 選擇特休
-                special_selectors = [
-                    "//span[contains(text(), '特休')]/ancestor::div[@role='option']",
-                    "//div[@role='option']//span[text()='特休']/..",
-                    "//div[@role='option' and contains(., '特休')]"
-                ]
-                special_leave = None
-                for selector in special_selectors:
-                    try:
-                        special_leave = driver.find_element(By.XPATH, selector)
-                        if special_leave:
-                            break
-                    except:
-                        continue
+    elif field == "確認勾選":
+        if element.get_attribute('aria-checked') != 'true':
+            element.click()
+        wait_for_condition(driver, lambda d: element.get_attribute('aria-checked') == 'true',
+                           f"{FIELD_LABELS[field]}未被勾選", limit(FIELD_CONFIRM_TIMEOUT))
 
-                if special_leave:
-                    special_leave.click()
-                    print(f"  ✓ 假別: {FIXED_DATA['假別']}")
-                else:
-                    raise Exception("找不到特休選項")
-            else:
-                raise Exception("找不到假別下拉選單")
-        except Exception as e:
-            print(f"  ✗ 假別選擇失敗: {e}")
-            raise
+    else:
+        element.clear()
+        element.send_keys(value)
+
+    return selector
+
+# 批次填寫腳本：arguments[0] 為各欄位的候選選擇器，arguments[1] 為各欄位的值
+# 回傳 {results: {欄位: 是否成功}, selectors: {欄位: 命中的選擇器},
+#       timings: {欄位: [開始, 結束]}（距離腳本開始的毫秒數）}
+BATCH_FILL_SCRIPT = r"""
+var selectors = arguments[0], values = arguments[1], results = {}, used = {}, timings = {};
+var scriptStart = performance.now();
+
+function isVisible(el) {
+    return el.offsetParent !== null || el.getClientRects().length > 0;
+}
+
+function locate(field, requireVisible) {
+    var list = selectors[field] || [];
+    for (var i = 0; i < list.length; i++) {
+        var found = document.evaluate(list[i], document, null,
+                                      XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (var j = 0; j < found.snapshotLength; j++) {
+            var el = found.snapshotItem(j);
+            if (!requireVisible || isVisible(el)) {
+                used[field] = list[i];
+                return el;
+            }
+        }
+    }
+    return null;
+}
+
+function activate(el) {
+    ['mousedown', 'mouseup'].forEach(function (type) {
+        el.dispatchEvent(new MouseEvent(type, {bubbles: true, cancelable: true, view: window}));
+    });
+    el.click();
+}
+
+function setValue(el, value) {
+    var setter = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(el), 'value').set;
+    el.focus();
+    setter.call(el, value);
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+    el.blur();
+    return el.value === value;
+}
+
+function check(el) {
+    if (el.getAttribute('aria-checked') !== 'true') {
+        activate(el);
+    }
+    return el.getAttribute('aria-checked') === 'true';
+}
+
+function selectOption(dropdown, value) {
+    if (dropdown.tagName === 'SELECT') {
+        for (var i = 0; i < dropdown.options.length; i++) {
+            if (dropdown.options[i].text.indexOf(value) !== -1) {
+                dropdown.selectedIndex = i;
+                dropdown.dispatchEvent(new Event('change', {bubbles: true}));
+                return true;
+            }
+        }
+        return false;
+    }
+    activate(dropdown);
+    var option = locate('假別選項', false);
+    if (!option) {
+        return false;
+    }
+    activate(option);
+    return option.getAttribute('aria-selected') === 'true' ||
+           (dropdown.textContent || '').indexOf(value) !== -1;
+}
+
+Object.keys(values).forEach(function (field) {
+    var fieldStart = performance.now() - scriptStart;
+    try {
+        var el = locate(field, true);
+        if (!el) {
+            results[field] = false;
+        } else if (field === '近假長假類型' || field === '確認勾選') {
+            results[field] = check(el);
+        } else if (field === '假別') {
+            results[field] = selectOption(el, values[field]);
+        } else {
+            results[field] = setValue(el, values[field]);
+        }
+    } catch (e) {
+        results[field] = false;
+    }
+    timings[field] = [fieldStart, performance.now() - scriptStart];
+});
+return {results: results, selectors: used, timings: timings};
+"""
 
-        # 5. 請假起點日期
-        print("[處理中] 填寫起始日期...")
+def batch_fill_form(driver, start_date, end_date, fields=None, cache=None, timings=None):
+    """以單一 execute_script 呼叫填寫全部欄位，回傳 {欄位: 是否成功}
+
+    有傳入 timings（dict）時填入各欄位在瀏覽器內的起訖時間 {欄位: (開始, 結束)}，
+    以 time.perf_counter_ns() 表示（以呼叫開始的時刻對齊腳本開始的時刻）
+    """
+    if fields is None:
+        fields = FORM_FIELDS
+    values = {field: get_field_value(field, start_date, end_date) for field in fields}
+    if cache:
+        selectors = {field: cache.ordered_selectors(field) for field in cache.selectors}
+    else:
+        selectors = FIELD_SELECTORS
+
+    start_ns = time.perf_counter_ns()
+    response = driver.execute_script(BATCH_FILL_SCRIPT, selectors, values) or {}
+    elapsed_ms = (time.perf_counter_ns() - start_ns) / 1e6
+    results = response.get("results", {})
+    if timings is not None:
+        for field, (field_start, field_end) in response.get("timings", {}).items():
+            timings[field] = (start_ns + int(field_start * 1e6), start_ns + int(field_end * 1e6))
+
+    if cache:
+        for field, selector in response.get("selectors", {}).items():
+            cached = cache.get(field)
+            if cached is not None and selector != cached:
+                cache.invalidate(field)
+            cache.record(field, selector, elapsed_ms)
+    return {field: bool(results.get(field)) for field in fields}
+
+def refill_form(driver, start_date, end_date, fields=None, cache=None, deadline=None):
+    """以快速路徑重新填寫指定欄位：先批次填寫，未完成的再逐欄補填
+
+    deadline 為 time.perf_counter() 時間軸上的期限，逐欄補填的所有等待都不會超過期限。
+    回傳仍然失敗的欄位列表
+    """
+    if fields is None:
+        fields = FORM_FIELDS
+    results = batch_fill_form(driver, start_date, end_date, fields, cache)
+    failed = []
+    for field in fields:
+        if results[field]:
+            continue
+        optional = field in OPTIONAL_FIELDS
+        timeout = OPTIONAL_FIELD_TIMEOUT if optional else FIELD_WAIT_TIMEOUT
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.perf_counter())
         try:
-            time.sleep(1)
-            start_selectors = [
-                "//input[@type='date' and contains(@aria-label, '起點')]",
-                "//input[@type='date'][1]",
-                "//input[@type='date']"
-            ]
-            start_date_input = None
-            for selector in start_selectors:
-                try:
-                    start_date_input = driver.find_element(By.XPATH, selector)
-                    if start_date_input:
-                        break
-                except:
-                    continue
+            if timeout <= 0:
+                raise TimeoutException("超過重填時間預算")
+            fill_single_field(driver, field, get_field_value(field, start_date, end_date), timeout, cache,
+                              deadline)
+        except Exception:
+            if not optional:
+                failed.append(field)
+    return failed
+
+# 讀回腳本：arguments[0] 為各欄位的候選選擇器，arguments[1] 為要讀取的欄位
+# 回傳 {欄位: 目前的值}，找不到的欄位為 null；密碼只回傳長度，勾選框回傳是否勾選
+READBACK_SCRIPT = r"""
+var selectors = arguments[0], fields = arguments[1], values = {};
+
+function locate(field) {
+    var list = selectors[field] || [];
+    for (var i = 0; i < list.length; i++) {
+        var found = document.evaluate(list[i], document, null,
+                                      XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        if (found) {
+            return found;
+        }
+    }
+    return null;
+}
 
-            if start_date_input:
-                driver.execute_script("arguments[0].scrollIntoView(true);", start_date_input)
-                time.sleep(0.5)
-                start_date_input.clear()
-                start_date_input.send_keys(start_date)
-                print(f"  ✓ 起始日期: {start_date}")
-            else:
-                raise Exception("找不到起始日期欄位")
-        except Exception as e:
-            print(f"  ✗ 起始日期填寫失敗: {e}")
-            raise
+function optionText(el) {
+    return el.getAttribute('data-value') || (el.textContent || '').trim();
+}
 
-        # 6. 請假終點日期
-        print("[處理中] 填寫結束日期...")
-        try:
-            time.sleep(0.5)
-            end_selectors = [
-                "//input[@type='date' and contains(@aria-label, '終點')]",
-                "//input[@type='date'][2]",
-                "(//input[@type='date'])[2]"
-            ]
-            end_date_input = None
-            for selector in end_selectors:
-                try:
-                    end_date_input = driver.find_element(By.XPATH, selector)
-                    if end_date_input:
-                        break
-                except:
-                    continue
+fields.forEach(function (field) {
+    var el = locate(field);
+    if (!el) {
+        values[field] = null;
+    } else if (field === '近假長假類型') {
+        var group = el.closest('[role=radiogroup]') || document;
+        var checked = group.querySelector('[role=radio][aria-checked=true]');
+        values[field] = checked ? optionText(checked) : '';
+    } else if (field === '假別') {
+        if (el.tagName === 'SELECT') {
+            values[field] = el.selectedIndex >= 0 ? el.options[el.selectedIndex].text : '';
+        } else {
+            var selected = el.querySelector('[role=option][aria-selected=true]') ||
+                           document.querySelector('[role=option][aria-selected=true]');
+            values[field] = selected ? optionText(selected) : (el.textContent || '').trim();
+        }
+    } else if (field === '確認勾選') {
+        values[field] = el.getAttribute('aria-checked') === 'true';
+    } else if (field === '請假密碼') {
+        values[field] = (el.value || '').length;
+    } else {
+        values[field] = el.value;
+    }
+});
+return values;
+"""
 
-            if end_date_input:
-                driver.execute_script("arguments[0].scrollIntoView(true);", end_date_input)
-                time.sleep(0.5)
-                end_date_input.clear()
-                end_date_input.send_keys(end_date)
-                print(f"  ✓ 結束日期: {end_date}")
-            else:
-                raise Exception("找不到結束日期欄位")
-        except Exception as e:
-            print(f"  ✗ 結束日期填寫失敗: {e}")
-            raise
+def read_form_values(driver, fields=None, cache=None):
+    """以單一 execute_script 呼叫讀回各欄位目前的值"""
+    if fields is None:
+        fields = FORM_FIELDS
+    selectors = {field: cache.ordered_selectors(field) for field in fields} if cache else FIELD_SELECTORS
+    return driver.execute_script(READBACK_SCRIPT, selectors, list(fields)) or {}
+
+def find_mismatched_fields(values, start_date, end_date):
+    """比對讀回的值與應填入的值，回傳不符的欄位（找不到的非必填欄位不算）"""
+    mismatched = []
+    for field, actual in values.items():
+        expected = get_field_value(field, start_date, end_date)
+        if actual is None:
+            matched = field in OPTIONAL_FIELDS
+        elif field == "確認勾選":
+            matched = actual is True
+        elif field == "請假密碼":
+            matched = actual == len(expected)
+        elif field in ("近假長假類型", "假別"):
+            matched = expected in actual
+        else:
+            matched = actual == expected
+        if not matched:
+            mismatched.append(field)
+    return mismatched
 
-        # 7. 確認勾選
-        print("[處理中] 勾選確認...")
-        try:
-            time.sleep(0.5)
-            checkbox_selectors = [
-                "//span[contains(text(), '我確認了')]/ancestor::div[@role='checkbox']",
-                "//div[@role='checkbox']//span[contains(text(), '我確認了')]/..",
-                "//div[@role='checkbox']"
-            ]
-            checkbox = None
-            for selector in checkbox_selectors:
-                try:
-                    checkbox = driver.find_element(By.XPATH, selector)
-                    if checkbox:
-                        break
-                except:
-                    continue
+def is_form_page_valid(driver, form_url=FORM_URL, timeout=OPTIONAL_FIELD_TIMEOUT):
+    """檢查瀏覽器是否仍停在可填寫的表單頁面（最多等待 timeout 秒讓第一個欄位出現）"""
+    try:
+        current_url = driver.current_url
+        if urlsplit(current_url).path != urlsplit(form_url).path:
+            return False
+        find_field(driver, FORM_FIELDS[0], timeout=max(0.0, timeout))
+        return True
+    except Exception:
+        return False
 
-            if checkbox:
-                driver.execute_script("arguments[0].scrollIntoView(true);", checkbox)
-                time.sleep(0.5)
-                if checkbox.get_attribute('aria-checked') != 'true':
-                    checkbox.click()
-                print("  ✓ 已勾選確認")
-            else:
-                print("  ⚠ 找不到確認勾選框（可能不是必填）")
+@contextmanager
+def page_load_limit(driver, timeout):
+    """暫時把頁面載入的逾時縮短為 timeout 秒（預設為 300 秒），結束後恢復原本的設定"""
+    previous = driver.timeouts.page_load
+    driver.set_page_load_timeout(timeout)
+    try:
+        yield
+    finally:
+        driver.set_page_load_timeout(previous)
+
+class StandbyRefresher:
+    """待命期間依排程（STANDBY_REFILL_OFFSETS）重新檢查並重填表單
+
+    頁面仍有效時以快速路徑重填；失效時重新載入並完整填寫，
+    仍無法恢復則拋出 RuntimeError，讓呼叫端在截止前放棄或改用其他送出方式。
+    """
+
+    def __init__(self, driver, start_date, end_date, form_url=FORM_URL, schema=None,
+                 offsets=STANDBY_REFILL_OFFSETS):
+        self.driver = driver
+        self.start_date = start_date
+        self.end_date = end_date
+        self.form_url = form_url
+        self.schema = schema
+        self.pending = sorted(offsets, reverse=True)
+
+    def seconds_to_next(self, remaining):
+        """距離下一次重填還有幾秒，沒有排程時回傳 None"""
+        if not self.pending:
+            return None
+        return max(0.0, remaining - self.pending[0])
+
+    def tick(self, remaining, budget=None):
+        """remaining 為距離送出的秒數；到了排程時間就重填（錯過的排程合併為一次）
+
+        budget 為重填最多可用的秒數（須在交給觸發前結束），None 表示不限制
+        """
+        if not self.pending or remaining > self.pending[0]:
+            return
+        while self.pending and remaining <= self.pending[0]:
+            self.pending.pop(0)
+        self.refresh(remaining, budget)
+
+    def verify(self, budget=READBACK_REFILL_BUDGET):
+        """送出前讀回全部欄位並比對，只在時間預算內重填不符的欄位
+
+        回傳仍然不符的欄位列表；無法讀取頁面時回傳 None
+        """
+        start = time.perf_counter()
+        deadline = start + budget
+        cache = SelectorCache(self.form_url, selectors=get_schema_selectors(self.schema))
+        try:
+            with TELEMETRY.span("readback") as meta:
+                mismatched = find_mismatched_fields(read_form_values(self.driver, cache=cache),
+                                                    self.start_date, self.end_date)
+                meta["mismatched"] = list(mismatched)
+                while mismatched and time.perf_counter() < deadline:
+                    print(f"\n[驗證] 欄位值不符，重新填寫: "
+                          f"{', '.join(FIELD_LABELS[field] for field in mismatched)}")
+                    refill_form(self.driver, self.start_date, self.end_date, mismatched, cache, deadline)
+                    mismatched = find_mismatched_fields(read_form_values(self.driver, mismatched, cache),
+                                                        self.start_date, self.end_date)
+                meta["remaining"] = list(mismatched)
         except Exception as e:
-            print(f"  ⚠ 確認勾選失敗（繼續執行）: {e}")
-
-        # 8. 請假密碼
-        print("[處理中] 填寫密碼...")
-        try:
-            time.sleep(0.5)
-            password_selectors = [
-                "//input[@type='password']",
-                "//input[contains(@aria-label, '密碼')]",
-                "//input[@type='password' or @type='text'][last()]"
-            ]
-            password_input = None
-            for selector in password_selectors:
-                try:
-                    password_input = driver.find_element(By.XPATH, selector)
-                    if password_input:
-                        break
-                except:
-                    continue
+            print(f"\n[警告] 無法讀回表單欄位: {e}")
+            return None
+        finally:
+            cache.save()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if mismatched:
+            print(f"\n[警告] 以下欄位仍與應填的值不符: "
+                  f"{', '.join(FIELD_LABELS[field] for field in mismatched)}（{elapsed_ms:.0f} ms）")
+        else:
+            print(f"\n[驗證] ✓ 全部欄位皆正確（{elapsed_ms:.0f} ms）")
+        return mismatched
+
+    def restore(self, deadline):
+        """送出失敗後重新載入表單並以快速路徑重填；deadline 為 time.perf_counter() 時間軸上的期限
 
-            if password_input:
-                driver.execute_script("arguments[0].scrollIntoView(true);", password_input)
-                time.sleep(0.5)
-                password_input.clear()
-                password_input.send_keys(FIXED_DATA['請假密碼'])
-                print("  ✓ 密碼: ********")
+        重新載入同樣受期限限制；回傳是否全部欄位都已填好
+        """
+        if deadline - time.perf_counter() <= 0:
+            return False
+        cache = SelectorCache(self.form_url, selectors=get_schema_selectors(self.schema))
+        try:
+            with page_load_limit(self.driver, deadline - time.perf_counter()):
+                self.driver.get(self.form_url)
+            return not refill_form(self.driver, self.start_date, self.end_date, cache=cache, deadline=deadline)
+        except Exception:
+            return False
+        finally:
+            cache.save()
+
+    def refresh(self, remaining, budget=None):
+        """檢查頁面並重填表單；有 budget 時檢查、重填與重新載入都在 budget 秒內結束"""
+        if budget is not None and budget <= 0:
+            print(f"\n[待命] 送出前 {int(remaining)} 秒，已沒有時間重新填寫，略過")
+            return
+        print(f"\n[待命] 送出前 {int(remaining)} 秒，重新檢查並填寫表單...")
+        start = time.perf_counter()
+        deadline = start + budget if budget is not None else None
+        check_timeout = OPTIONAL_FIELD_TIMEOUT if deadline is None else min(OPTIONAL_FIELD_TIMEOUT, budget)
+        cache = SelectorCache(self.form_url, selectors=get_schema_selectors(self.schema))
+        try:
+            if is_form_page_valid(self.driver, self.form_url, check_timeout):
+                failed = refill_form(self.driver, self.start_date, self.end_date, cache=cache, deadline=deadline)
+                if not failed:
+                    print(f"[待命] ✓ 表單已重新填寫（{(time.perf_counter() - start) * 1000:.0f} ms）")
+                    return
+                print(f"[警告] 重填失敗的欄位: {', '.join(FIELD_LABELS[field] for field in failed)}")
             else:
-                raise Exception("找不到密碼欄位")
-        except Exception as e:
-            print(f"  ✗ 密碼填寫失敗: {e}")
-            raise
+                print("[警告] 表單頁面已失效")
+        finally:
+            cache.save()
+
+        print("[待命] 重新載入表單...")
+        if deadline is not None:
+            # 有時間限制時以受期限限制的快速路徑重新載入並重填
+            restored = self.restore(deadline)
+        else:
+            restored = fill_form(self.driver, self.start_date, self.end_date, self.form_url, self.schema)
+        if not restored:
+            # 等待與送出還會繼續使用瀏覽器，先等背景執行緒保存完截圖與頁面原始碼
+            DIAGNOSTICS.wait(DIAGNOSTICS_WAIT_TIMEOUT)
+            raise RuntimeError("重新載入後仍無法填寫表單")
+        print(f"[待命] ✓ 表單已恢復（{(time.perf_counter() - start) * 1000:.0f} ms）")
+
+def print_fill_report(timings):
+    """顯示各欄位填寫耗時"""
+    print("\n[耗時] 各步驟耗時：")
+    for label, elapsed_ms in timings:
+        print(f"  {label}：{elapsed_ms:8.0f} ms")
+    print(f"  合計：{sum(elapsed_ms for _, elapsed_ms in timings):8.0f} ms")
+
+def fill_form(driver, start_date, end_date, form_url=FORM_URL, schema=None):
+    """填寫表單（不送出）
+
+    每個欄位都以條件等待（元素出現且可互動）取代固定延遲，並記錄各欄位耗時；
+    有表單結構時優先以 entry ID 定位題目
+    """
+    load_browser_modules()
+    print("\n[處理中] 正在開啟表單...")
+    page_start = time.perf_counter()
+    with TELEMETRY.span("driver.get"):
+        driver.get(form_url)
+    timings = [("開啟表單", (time.perf_counter() - page_start) * 1000)]
+    cache = SelectorCache(form_url, selectors=get_schema_selectors(schema))
+
+    try:
+        print("[處理中] 正在填寫表單...")
+
+        pending = list(FORM_FIELDS)
+        if FILL_MODE == "batch":
+            # 等第一個欄位可互動後，一次填寫全部欄位
+            batch_start = time.perf_counter()
+            field_times = {}
+            with TELEMETRY.span("fill.batch") as meta:
+                find_field(driver, FORM_FIELDS[0], cache=cache)
+                ready = time.perf_counter()
+                results = batch_fill_form(driver, start_date, end_date, cache=cache, timings=field_times)
+                batch_end = time.perf_counter()
+                meta["failed"] = [field for field in FORM_FIELDS if not results[field]]
+                # 各欄位在瀏覽器內的耗時也記成 span，與逐欄填寫的紀錄可以直接比較
+                for field, (start_ns, end_ns) in field_times.items():
+                    TELEMETRY.record_span(f"fill.{field}", start_ns, end_ns, mode="batch", filled=results[field])
+
+            # 批次填寫的耗時拆成等待欄位就緒、各欄位與呼叫往返，合計不變
+            timings.append(("等待欄位就緒", (ready - batch_start) * 1000))
+            fields_ms = 0.0
+            for field in FORM_FIELDS:
+                if field in field_times:
+                    start_ns, end_ns = field_times[field]
+                    timings.append((f"{FIELD_LABELS[field]}（批次）", (end_ns - start_ns) / 1e6))
+                    fields_ms += (end_ns - start_ns) / 1e6
+            timings.append(("批次呼叫往返", max(0.0, (batch_end - ready) * 1000 - fields_ms)))
+
+            for field in FORM_FIELDS:
+                if results[field]:
+                    value = get_field_value(field, start_date, end_date)
+                    print(f"  ✓ {FIELD_LABELS[field]}: {describe_field_value(field, value)}")
+            pending = [field for field in FORM_FIELDS if not results[field]]
+            if pending:
+                print(f"[提示] 批次填寫未完成的欄位改為逐欄填寫: "
+                      f"{', '.join(FIELD_LABELS[field] for field in pending)}")
+
+        for field in pending:
+            label = FIELD_LABELS[field]
+            value = get_field_value(field, start_date, end_date)
+            optional = field in OPTIONAL_FIELDS
+            timeout = OPTIONAL_FIELD_TIMEOUT if optional else FIELD_WAIT_TIMEOUT
+
+            print(f"[處理中] 填寫{label}...")
+            field_start = time.perf_counter()
+            try:
+                with TELEMETRY.span(f"fill.{field}", optional=optional):
+                    fill_single_field(driver, field, value, timeout, cache)
+                print(f"  ✓ {label}: {describe_field_value(field, value)}")
+            except Exception as e:
+                if not optional:
+                    print(f"  ✗ {label}填寫失敗: {e}")
+                    raise
+                print(f"  ⚠ {label}失敗（可能不是必填，繼續執行）: {e}")
+            finally:
+                timings.append((label, (time.perf_counter() - field_start) * 1000))
 
         print("\n[完成] 表單填寫完畢，等待送出時間...")
-        time.sleep(2)  # 給表單一點時間確保所有值都已填入
+        print_fill_report(timings)
         return True
 
     except Exception as e:
         print(f"\n[錯誤] 填寫表單時發生錯誤: {e}")
-        print("\n[除錯] 嘗試截圖...")
+        # 截圖、頁面原始碼、錯誤堆疊與事件紀錄由背景執行緒保存
+        directory = DIAGNOSTICS.capture(driver, "fill_form", e)
+        print(f"[除錯] 截圖與事件紀錄將保存至: {directory}")
+        return False
+
+    finally:
+        cache.save()
+
+# ==================== 表單結構 ====================
+
+# Google 表單題型代碼
+QUESTION_TYPES = {
+    0: "簡答",
+    1: "段落",
+    2: "單選",
+    3: "下拉選單",
+    4: "核取方塊",
+    5: "線性刻度",
+    7: "格狀",
+    8: "分頁",
+    9: "日期",
+    10: "時間",
+}
+
+def parse_form_schema(html):
+    """從表單頁面的 FB_PUBLIC_LOAD_DATA_ 解析題目結構
+
+    回傳 {hash, page_count, questions, fields}，找不到結構資料時拋出 ValueError
+    """
+    match = re.search(r"FB_PUBLIC_LOAD_DATA_\s*=\s*(.*?);\s*</script>", html, re.S)
+    if not match:
+        raise ValueError("頁面中找不到 FB_PUBLIC_LOAD_DATA_")
+    data = json.loads(match.group(1))
+    items = data[1][1] or []
+
+    questions = []
+    page_count = 1
+    for item in items:
+        item_type = item[3] if len(item) > 3 else None
+        if item_type == 8:
+            page_count += 1
+        if len(item) < 5 or not item[4]:
+            continue
+        entry = item[4][0]
+        questions.append({
+            "entry_id": str(entry[0]),
+            "title": item[1] or "",
+            "type": item_type,
+            "options": [option[0] for option in (entry[1] or []) if option and option[0]],
+            "required": bool(entry[2]) if len(entry) > 2 else False,
+        })
+
+    fields = {}
+    for question in questions:
+        field = match_schema_field(question)
+        if field and field not in fields:
+            fields[field] = question
+
+    structure = json.dumps(items, ensure_ascii=False, sort_keys=True)
+    return {
+        "hash": hashlib.sha256(structure.encode('utf-8')).hexdigest(),
+        "page_count": page_count,
+        "questions": questions,
+        "fields": fields,
+    }
+
+def match_schema_field(question):
+    """依題目標題與題型對應到本工具的欄位名稱，無法對應時回傳 None"""
+    title = question["title"]
+    question_type = question["type"]
+    options = question["options"]
+
+    # 「長假號碼牌」也含有「長假」，需先於請假類型判斷
+    if "號碼牌" in title:
+        return "長假號碼牌"
+    if "補充" in title:
+        return "補充事項"
+    if "密碼" in title:
+        return "請假密碼"
+    if "員工代號" in title:
+        return "員工代號"
+    if "姓名" in title:
+        return "姓名"
+    if question_type == 9:
+        if "起" in title:
+            return "起始日期"
+        if any(keyword in title for keyword in ("終", "結束", "迄")):
+            return "結束日期"
+        return None
+    if question_type == 2 and any(FIXED_DATA['近假長假類型'] in option for option in options):
+        return "近假長假類型"
+    if question_type == 3 or "假別" in title:
+        return "假別"
+    if question_type == 4:
+        return "確認勾選"
+    return None
+
+def validate_form_schema(schema):
+    """檢查表單結構是否仍符合本工具的設定，回傳問題列表（空列表代表正常）"""
+    fields = schema["fields"]
+    problems = []
+    for field in REQUIRED_ENTRY_FIELDS:
+        if field not in fields:
+            problems.append(f"找不到「{FIELD_LABELS.get(field, field)}」題目")
+
+    for field in ("近假長假類型", "假別"):
+        if field in fields and FIXED_DATA[field] not in fields[field]["options"]:
+            problems.append(f"「{FIELD_LABELS[field]}」沒有「{FIXED_DATA[field]}」選項")
+
+    if "確認勾選" in fields and get_confirm_checkbox_text(schema) is None:
+        problems.append(f"確認勾選框沒有包含「{CONFIRM_CHECKBOX_TEXT}」的選項")
+    return problems
+
+def get_confirm_checkbox_text(schema=None):
+    """確認勾選框的完整選項文字；沒有表單結構時回傳設定的文字"""
+    if not schema or "確認勾選" not in schema["fields"]:
+        return CONFIRM_CHECKBOX_TEXT
+    for option in schema["fields"]["確認勾選"]["options"]:
+        if CONFIRM_CHECKBOX_TEXT in option:
+            return option
+    return None
+
+def get_entry_ids(schema=None):
+    """各欄位的 entry ID：FORM_ENTRY_IDS 有設定的優先，其餘取自表單結構"""
+    entry_ids = dict(FORM_ENTRY_IDS)
+    if schema:
+        for field, question in schema["fields"].items():
+            if not entry_ids.get(field):
+                entry_ids[field] = question["entry_id"]
+    return entry_ids
+
+def get_schema_selectors(schema=None):
+    """依表單結構產生各欄位的選擇器（以 entry ID 定位題目），排在原有選擇器之前"""
+    selectors = {field: list(candidates) for field, candidates in FIELD_SELECTORS.items()}
+    if not schema:
+        return selectors
+
+    for field, question in schema["fields"].items():
+        if field not in selectors:
+            continue
+        container = f"//div[contains(@data-params, '[[{question['entry_id']},')]"
+        if field == "近假長假類型":
+            candidates = [f"{container}//div[@role='radio' and @data-value='{FIXED_DATA[field]}']"]
+        elif field == "假別":
+            candidates = [f"{container}//div[@role='listbox']"]
+            selectors["假別選項"].insert(0, f"//div[@role='option' and @data-value='{FIXED_DATA[field]}']")
+        elif field == "確認勾選":
+            candidates = [f"{container}//div[@role='checkbox']"]
+        elif field in ("起始日期", "結束日期"):
+            candidates = [f"{container}//input[@type='date']"]
+        else:
+            candidates = [f"{container}//input"]
+        selectors[field] = candidates + selectors[field]
+    return selectors
+
+def fetch_form_schema(form_url=FORM_URL, timeout=10):
+    """下載表單頁面並解析題目結構"""
+    import urllib.request
+
+    request = urllib.request.Request(form_url, headers={"User-Agent": "Mozilla/5.0"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        html = response.read().decode('utf-8', errors='replace')
+    schema = parse_form_schema(html)
+    schema["fetched"] = datetime.now().isoformat(timespec='seconds')
+    return schema
+
+def load_form_schema(form_url=FORM_URL, refresh=False):
+    """取得表單結構：預設讀取本機快取，refresh=True 時重新下載並更新快取
+
+    重新下載時若結構與快取不同或不符合設定，會顯示警告；
+    下載失敗則沿用快取。沒有可用結構時回傳 None。
+    """
+    cache = load_json_file(FORM_SCHEMA_PATH)
+    cached = cache.get(form_url)
+    if cached and not refresh:
+        return cached
+
+    try:
+        schema = fetch_form_schema(form_url)
+    except Exception as e:
+        print(f"[警告] 無法取得表單結構: {e}")
+        if cached:
+            print("[提示] 沿用先前快取的表單結構")
+        return cached
+
+    if cached and cached.get("hash") != schema["hash"]:
+        print("[警告] 表單結構與上次不同，已重新對應欄位")
+
+    problems = validate_form_schema(schema)
+    for problem in problems:
+        print(f"[警告] 表單結構異常：{problem}")
+    if not problems:
+        print(f"[成功] 已取得表單結構（{len(schema['questions'])} 題，"
+              f"對應 {len(schema['fields'])} 個欄位）")
+
+    cache[form_url] = schema
+    save_json_file(FORM_SCHEMA_PATH, cache)
+    return schema
+
+def show_form_schema(form_url=FORM_URL):
+    """重新取得並顯示表單結構"""
+    schema = load_form_schema(form_url, refresh=True)
+    if schema is None:
+        return
+    print(f"[結構] 內容雜湊 {schema['hash'][:12]}，共 {schema['page_count']} 頁")
+    mapped = {question["entry_id"]: field for field, question in schema["fields"].items()}
+    for question in schema["questions"]:
+        field = mapped.get(question["entry_id"])
+        label = FIELD_LABELS.get(field, field) if field else "（未對應）"
+        options = f"：{' / '.join(question['options'])}" if question["options"] else ""
+        print(f"  entry.{question['entry_id']} [{QUESTION_TYPES.get(question['type'], question['type'])}] "
+              f"{question['title']} → {label}{options}")
+
+# ==================== 精確計時 ====================
+
+def percentile(values, pct):
+    """取百分位數（最近排名法），values 為空時回傳 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(-(-pct * len(ordered) // 100)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def raise_priority():
+    """盡可能提高目前行程與執行緒的優先權
+
+    Windows 使用 SetPriorityClass / SetThreadPriority，其他平台使用 os.nice
+    （一般使用者通常沒有權限，此時維持原狀）。回傳 (是否成功, 還原用的函式)
+    """
+    if sys.platform == "win32":
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        process = kernel32.GetCurrentProcess()
+        thread = kernel32.GetCurrentThread()
+        old_class = kernel32.GetPriorityClass(process)
+        old_priority = kernel32.GetThreadPriority(thread)
+        raised = bool(kernel32.SetPriorityClass(process, 0x80))   # HIGH_PRIORITY_CLASS
+        raised = bool(kernel32.SetThreadPriority(thread, 2)) or raised   # THREAD_PRIORITY_HIGHEST
+
+        def restore():
+            kernel32.SetThreadPriority(thread, old_priority)
+            kernel32.SetPriorityClass(process, old_class)
+        return raised, restore
+
+    try:
+        old_nice = os.nice(0)
+        os.nice(-5)
+    except (AttributeError, OSError):
+        return False, lambda: None
+
+    def restore():
         try:
-            screenshot_path = os.path.join(os.path.expanduser("~"), "Desktop", "form_error.png")
-            driver.save_screenshot(screenshot_path)
-            print(f"[除錯] 截圖已保存至: {screenshot_path}")
-        except:
-            print("[除錯] 無法保存截圖")
+            os.nice(old_nice - os.nice(0))
+        except OSError:
+            pass
+    return True, restore
+
+@contextmanager
+def critical_window():
+    """送出前的關鍵時段：先回收並凍結現有物件、停用垃圾回收，再提高優先權；離開時全部還原
+
+    回傳 {"priority_raised": 是否成功提高優先權}
+    """
+    gc_enabled = gc.isenabled()
+    gc.collect()
+    gc.freeze()
+    gc.disable()
+    raised, restore_priority = raise_priority()
+    try:
+        yield {"priority_raised": raised}
+    finally:
+        restore_priority()
+        gc.unfreeze()
+        if gc_enabled:
+            gc.enable()
+
+class CountdownDisplay:
+    """關鍵時段的倒數顯示
+
+    在背景執行緒以低頻率更新畫面，距離觸發時刻 quiet 秒時停止，
+    讓主執行緒的精確等待不必與輸出爭用 GIL
+    """
+
+    def __init__(self, clock, fire_time, interval=COUNTDOWN_RENDER_INTERVAL, quiet=0.1):
+        self.clock = clock
+        self.fire_time = fire_time
+        self.interval = interval
+        self.quiet = quiet
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            remaining = self.clock.seconds_until(self.fire_time)
+            if remaining <= self.quiet:
+                print("\n\n[送出!] 正在提交表單...", flush=True)
+                return
+            print(f"\r  >>> {remaining:.3f} 秒 <<<", end='', flush=True)
+            self._stop.wait(min(self.interval, remaining - self.quiet))
+
+    def stop(self):
+        """停止顯示並等待執行緒結束"""
+        self._stop.set()
+        self._thread.join()
+
+class DeadlineScheduler:
+    """在指定時刻觸發回呼的高精度計時器
+
+    先以 time.sleep 粗略等待到目標前的保護區間（guard band），
+    再以 time.perf_counter_ns() 忙碌等待到目標時刻，
+    避免 sleep 因系統排程粒度而超過目標。每次觸發的實際誤差都會記錄下來。
+    """
+
+    def __init__(self, guard_band=SPIN_GUARD_BAND):
+        self.guard_band_ns = int(guard_band * 1e9)
+        self.errors_ns = []   # 每次觸發的誤差（實際 - 目標，奈秒）
+
+    def wait_until(self, deadline_ns):
+        """等待到 perf_counter_ns() 時間軸上的 deadline_ns，回傳觸發誤差（奈秒）"""
+        while True:
+            remaining_ns = deadline_ns - time.perf_counter_ns()
+            if remaining_ns <= self.guard_band_ns:
+                break
+            time.sleep((remaining_ns - self.guard_band_ns) / 1e9)
+
+        while time.perf_counter_ns() < deadline_ns:
+            pass
+
+        error_ns = time.perf_counter_ns() - deadline_ns
+        self.errors_ns.append(error_ns)
+        return error_ns
+
+    def run_at(self, deadline_ns, callback, *args, **kwargs):
+        """在 deadline_ns 觸發 callback，回傳 callback 的結果"""
+        self.wait_until(deadline_ns)
+        return callback(*args, **kwargs)
+
+    def stats(self):
+        """觸發誤差統計（微秒）"""
+        errors_us = [error / 1000 for error in self.errors_ns]
+        return {
+            "runs": len(errors_us),
+            "p50_us": percentile(errors_us, 50),
+            "p99_us": percentile(errors_us, 99),
+            "max_us": max(errors_us) if errors_us else None,
+        }
+
+def benchmark_scheduler(runs=200, guard_band=SPIN_GUARD_BAND, critical=False):
+    """以大量隨機目標時刻測量計時器的觸發誤差
+
+    critical 為 True 時分別在一般狀態與關鍵時段（critical_window）下測量，比較兩者差異
+    """
+    import random
+
+    print(f"[測試] 精確計時器觸發誤差（{runs} 次，保護區間 {guard_band * 1000:.1f} ms）")
+    modes = [("一般", False), ("關鍵時段", True)] if critical else [("一般", False)]
+    results = {}
+    for label, use_window in modes:
+        scheduler = DeadlineScheduler(guard_band)
+        with critical_window() if use_window else nullcontext({}) as state:
+            for _ in range(runs):
+                delay_ns = int(random.uniform(0.005, 0.05) * 1e9)
+                scheduler.wait_until(time.perf_counter_ns() + delay_ns)
+
+        stats = scheduler.stats()
+        results[label] = stats
+        note = ""
+        if use_window:
+            note = "（已提高優先權）" if state["priority_raised"] else "（無權限提高優先權）"
+        print(f"  {label}{note}：p50 {stats['p50_us']:.1f} µs / "
+              f"p99 {stats['p99_us']:.1f} µs / max {stats['max_us']:.1f} µs")
+    return results if critical else results["一般"]
+
+# ==================== 執行遙測 ====================
+
+class Telemetry:
+    """以 span 記錄每個階段的起訖時間（單調時鐘）與附加資料，每次執行寫成一個 JSONL 檔
+
+    span 先暫存在記憶體，flush() 時才寫檔，避免在送出前的關鍵時段做磁碟 I/O；
+    尚未 start_run() 時不記錄。另以固定大小的環狀緩衝區保存帶時間戳記的事件
+    （含每個 span 的起訖），供失敗或送出後寫入事後分析資料（見 Diagnostics）。
+    """
 
+    def __init__(self, directory=TELEMETRY_DIR, buffer_size=EVENT_BUFFER_SIZE):
+        self.directory = directory
+        self.run_id = None
+        self.spans = []
+        self.events = deque(maxlen=buffer_size)
+
+    def start_run(self):
+        """開始新的一次執行，回傳執行代號"""
+        self.run_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        self.spans = []
+        self.events.clear()
+        return self.run_id
+
+    def event(self, name, **data):
+        """在事件緩衝區記下一筆事件（只附加到記憶體，不做任何 I/O；滿了就丟棄最舊的）"""
+        self.events.append((time.perf_counter_ns(), name, data))
+
+    def snapshot_events(self):
+        """取得事件緩衝區的快照（由舊到新），時間戳記換算為本機時間"""
+        offset_ns = time.time_ns() - time.perf_counter_ns()
+        return [{"perf_ns": timestamp_ns,
+                 "time": datetime.fromtimestamp((timestamp_ns + offset_ns) / 1e9).isoformat(timespec='microseconds'),
+                 "event": name, **data}
+                for timestamp_ns, name, data in list(self.events)]
+
+    def discard(self):
+        """結束本次執行但不寫檔（例如效能測試），回傳已記錄的 span"""
+        spans = self.spans
+        self.run_id = None
+        self.spans = []
+        return spans
+
+    @contextmanager
+    def span(self, name, **meta):
+        """記錄 with 區塊的耗時；區塊內可再往取得的 dict 補充資料"""
+        start_ns = time.perf_counter_ns()
+        self.events.append((start_ns, name, {"phase": "start"}))
+        error = None
+        try:
+            yield meta
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            end_ns = time.perf_counter_ns()
+            self.events.append((end_ns, name, {"phase": "end", "duration_ms": round((end_ns - start_ns) / 1e6, 3),
+                                               "error": error, **meta}))
+            if self.run_id is not None:
+                record = {"run": self.run_id, "name": name, "start_ns": start_ns, "end_ns": end_ns,
+                          "duration_ms": round((end_ns - start_ns) / 1e6, 3), "meta": meta}
+                if error is not None:
+                    record["error"] = error
+                self.spans.append(record)
+
+    def record_span(self, name, start_ns, end_ns, **meta):
+        """記錄在其他地方量測的區段（例如瀏覽器內的批次填寫），時間以 time.perf_counter_ns() 表示"""
+        duration_ms = round((end_ns - start_ns) / 1e6, 3)
+        self.events.append((start_ns, name, {"phase": "start"}))
+        self.events.append((end_ns, name, {"phase": "end", "duration_ms": duration_ms, "error": None, **meta}))
+        if self.run_id is not None:
+            self.spans.append({"run": self.run_id, "name": name, "start_ns": start_ns, "end_ns": end_ns,
+                               "duration_ms": duration_ms, "meta": meta})
+
+    def flush(self):
+        """將暫存的 span 寫入本次執行的 JSONL 檔，寫入失敗不影響主流程"""
+        if self.run_id is None or not self.spans:
+            return None
+        path = os.path.join(self.directory, f"{self.run_id}.jsonl")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                for record in self.spans:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            print(f"[警告] 無法寫入耗時紀錄: {e}")
+            return None
+        self.spans = []
+        return path
+
+TELEMETRY = Telemetry()
+
+class Diagnostics:
+    """事後分析資料：由背景執行緒把截圖、頁面原始碼與事件緩衝區寫到每次執行的目錄
+
+    capture() 只取得事件緩衝區的快照並啟動執行緒，截圖與寫檔都不在呼叫端進行；
+    再次使用或關閉瀏覽器前應先呼叫 wait()，避免與背景執行緒同時操作瀏覽器
+    """
+
+    def __init__(self, directory=DIAGNOSTICS_DIR, telemetry=TELEMETRY):
+        self.directory = directory
+        self.telemetry = telemetry
+        self.threads = []
+
+    def capture(self, driver, reason, error=None):
+        """在背景保存目前的狀態，reason 作為檔名；回傳保存的目錄"""
         import traceback
-        traceback.print_exc()
-        return False
 
-def wait_and_submit(driver, target_time):
-    """等待到指定時間並送出表單"""
-    print("\n[同步中] 正在同步國家標準時間...")
-    current_time, is_ntp = get_ntp_time()
+        run_id = self.telemetry.run_id or datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        info = {"run": run_id, "reason": reason, "time": datetime.now().isoformat(timespec='microseconds')}
+        if error is not None:
+            info["error"] = f"{type(error).__name__}: {error}"
+            info["traceback"] = traceback.format_exc()
+        directory = os.path.join(self.directory, run_id)
+        thread = threading.Thread(target=self._write,
+                                  args=(driver, directory, reason, info, self.telemetry.snapshot_events()),
+                                  daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        return directory
+
+    def _write(self, driver, directory, reason, info, events):
+        """寫入截圖、頁面原始碼、事件紀錄與摘要，任何一項失敗都不影響其他項目"""
+        prefix = os.path.join(directory, reason)
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            return
+        if driver is not None:
+            try:
+                info["url"] = driver.current_url
+                if driver.save_screenshot(prefix + ".png"):
+                    info["screenshot"] = prefix + ".png"
+            except Exception as e:
+                info["screenshot_error"] = str(e)
+            try:
+                with open(prefix + ".html", 'w', encoding='utf-8') as f:
+                    f.write(driver.page_source)
+                info["page_source"] = prefix + ".html"
+            except Exception as e:
+                info["page_source_error"] = str(e)
+        try:
+            with open(prefix + ".events.jsonl", 'w', encoding='utf-8') as f:
+                for event in events:
+                    f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+            info["events"] = len(events)
+        except OSError:
+            pass
+        save_json_file(prefix + ".json", info)
+
+    def wait(self, timeout=30):
+        """等待背景寫入完成"""
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = [thread for thread in self.threads if thread.is_alive()]
+
+DIAGNOSTICS = Diagnostics()
+
+def load_telemetry_runs(directory=TELEMETRY_DIR, limit=None):
+    """讀取過去各次執行的 span，由舊到新回傳 [(執行代號, [span, ...]), ...]"""
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith(".jsonl"))
+    except OSError:
+        return []
+    if limit:
+        names = names[-limit:]
+
+    runs = []
+    for name in names:
+        spans = []
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        spans.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+        if spans:
+            runs.append((name[:-len(".jsonl")], spans))
+    return runs
+
+def summarize_telemetry(limit=None):
+    """彙整過去執行的各階段耗時 p50 / p95"""
+    runs = load_telemetry_runs(limit=limit)
+    if not runs:
+        print(f"[提示] 尚無耗時紀錄（{TELEMETRY_DIR}）")
+        return {}
+
+    # 依各階段在執行中出現的先後排列
+    durations = {}
+    for _, spans in runs:
+        for record in sorted(spans, key=lambda record: record.get("start_ns", 0)):
+            durations.setdefault(record["name"], []).append(record["duration_ms"])
+
+    print(f"[耗時] 最近 {len(runs)} 次執行（{runs[0][0]} ~ {runs[-1][0]}）各階段耗時：")
+    summary = {}
+    for name, values in durations.items():
+        summary[name] = {"count": len(values), "p50_ms": percentile(values, 50), "p95_ms": percentile(values, 95)}
+        print(f"  {name}：{len(values)} 筆，p50 {summary[name]['p50_ms']:.1f} ms / "
+              f"p95 {summary[name]['p95_ms']:.1f} ms")
+    return summary
+
+# ==================== HTTP 直接送出 ====================
+
+def append_run_log(event, **data):
+    """將事件寫入執行紀錄（JSONL），寫入失敗不影響主流程"""
+    record = {"time": datetime.now().isoformat(timespec='milliseconds'), "event": event}
+    record.update(data)
+    try:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with open(RUN_LOG_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"[警告] 無法寫入執行紀錄: {e}")
+
+def open_http_connection(url, timeout=10):
+    """依網址建立（尚未連線的）HTTP/HTTPS 連線物件"""
+    parts = urlsplit(url)
+    if parts.scheme == "https":
+        return http.client.HTTPSConnection(parts.hostname, parts.port, timeout=timeout)
+    return http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+
+class WarmConnection:
+    """對表單主機預先建立並保持的連線
+
+    事先完成 DNS 解析與 TCP/TLS 握手，等待期間以 HEAD 請求維持連線，
+    送出前檢查連線狀態，失效時主動重新連線。
+    """
+
+    def __init__(self, url=FORM_URL, timeout=10):
+        self.url = url
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ping_path = parts.path + (f"?{parts.query}" if parts.query else "")
+        self.timeout = timeout
+        self.conn = None
+        self.last_used = None
+        self.request_sent = False               # 最近一次 request() 是否已把請求完整送出
+
+    def connect(self, timeout=None):
+        """解析主機並完成握手，回傳各階段耗時（毫秒）
+
+        timeout 只限制這次握手，之後的請求仍以 self.timeout 為逾時
+        """
+        self.close()
+        start = time.perf_counter()
+        socket.getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+        self.conn = open_http_connection(self.url, timeout or self.timeout)
+        self.conn.connect()
+        self.conn.timeout = self.timeout
+        self.conn.sock.settimeout(self.timeout)
+        connected = time.perf_counter()
+        self.last_used = connected
+        return {
+            "dns_ms": round((resolved - start) * 1000, 3),
+            "connect_ms": round((connected - resolved) * 1000, 3),
+        }
+
+    def request(self, method, path, body=None, headers=None):
+        """在保持的連線上送出請求，回傳 (HTTP 狀態碼, 回應標頭, 回應內容)"""
+        self.request_sent = False
+        if self.conn is None:
+            self.connect()
+        self.conn.request(method, path, body=body, headers=headers or {})
+        self.request_sent = True
+        response = self.conn.getresponse()
+        content = response.read()
+        self.last_used = time.perf_counter()
+        return response.status, {name.lower(): value for name, value in response.getheaders()}, content
+
+    def ping(self, path=None, timeout=None):
+        """送出 HEAD 請求（預設為表單網址）確認連線，回傳往返時間（秒）；失敗或逾時回傳 None"""
+        try:
+            if self.conn is None:
+                self.connect(timeout)
+            if timeout is not None:
+                self.conn.sock.settimeout(timeout)
+            start = time.perf_counter()
+            self.conn.request("HEAD", path or self.ping_path, headers={"Connection": "keep-alive"})
+            response = self.conn.getresponse()
+            response.read()
+            rtt = time.perf_counter() - start
+            self.last_used = time.perf_counter()
+            # 伺服器要求關閉連線時立即重連，避免送出時才握手
+            if response.will_close:
+                self.connect(timeout)
+            elif timeout is not None:
+                self.conn.sock.settimeout(self.timeout)
+            return rtt
+        except Exception:
+            self.close()
+            return None
+
+    def keepalive(self, interval=KEEPALIVE_INTERVAL, timeout=None):
+        """距離上次使用超過 interval 秒就送出一次保溫請求"""
+        if self.last_used is None or time.perf_counter() - self.last_used >= interval:
+            self.ping(timeout=timeout)
+
+    def ensure_healthy(self, timeout=None):
+        """確認連線可用，失效時重新連線；回傳連線是否可用
+
+        有指定 timeout 時，整個檢查（含重新連線）不超過 timeout 秒（DNS 解析除外）
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+
+        def time_left():
+            return None if deadline is None else max(deadline - time.perf_counter(), 0.001)
+
+        if self.conn is not None and self.ping(timeout=time_left()) is not None:
+            return True
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        try:
+            self.connect(time_left())
+        except Exception:
+            return False
+        return self.ping(timeout=time_left()) is not None
+
+    def close(self):
+        """關閉連線"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+def measure_connect_times(host, port, samples=LATENCY_SAMPLES, timeout=5):
+    """量測 TCP 握手時間（秒）：只經過網路與對方的核心，不含伺服器處理請求的時間"""
+    address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4]
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        sock = socket.create_connection(address[:2], timeout)
+        times.append(time.perf_counter() - start)
+        sock.close()
+    return times
+
+def calibrate_latency(url=FORM_URL, samples=LATENCY_SAMPLES, connection=None, probe_path=LATENCY_PROBE_PATH):
+    """量測到表單主機的往返延遲，估算單程延遲與送出提前量
+
+    在同一條保持連線上連續以 HEAD 請求靜態資源 probe_path，第一次不列入統計；
+    以最低往返延遲的一半作為單程延遲（最不受伺服器處理時間影響），
+    並另外記錄 TCP 握手時間供比對。
+    有提供 connection 時沿用該連線（量測後保持開啟）。
+    回傳量測結果字典，無法量測時回傳 None。
+    """
+    own_connection = connection is None
+    if own_connection:
+        connection = WarmConnection(url)
+
+    rtts = []
+    try:
+        for index in range(samples + 1):
+            rtt = connection.ping(probe_path)
+            if rtt is None:
+                raise ConnectionError(f"無法連線到 {connection.host}")
+            if index > 0:
+                rtts.append(rtt)
+    except Exception as e:
+        print(f"[警告] 網路延遲量測失敗: {e}")
+    finally:
+        if own_connection:
+            connection.close()
+
+    if not rtts:
+        return None
+
+    try:
+        connect_times = measure_connect_times(connection.host, connection.port, samples)
+    except OSError:
+        connect_times = []
+
+    lead = min(min(rtts) / 2, LATENCY_MAX_LEAD)
+    return {
+        "host": connection.host,
+        "probe_path": probe_path,
+        "samples": len(rtts),
+        "rtt_ms": [round(rtt * 1000, 3) for rtt in rtts],
+        "rtt_min_ms": round(min(rtts) * 1000, 3),
+        "rtt_p50_ms": round(percentile(rtts, 50) * 1000, 3),
+        "rtt_p90_ms": round(percentile(rtts, 90) * 1000, 3),
+        "connect_ms": [round(elapsed * 1000, 3) for elapsed in connect_times],
+        "connect_min_ms": round(min(connect_times) * 1000, 3) if connect_times else None,
+        "lead_ms": round(lead * 1000, 3),
+    }
+
+# 瀏覽器端保溫：由頁面自行送出 HEAD 請求，維持 Chrome 與表單主機的連線
+BROWSER_KEEPALIVE_SCRIPT = (
+    "fetch(location.href, {method: 'HEAD', cache: 'no-store', credentials: 'same-origin'})"
+    ".catch(function () {});"
+)
+
+class ConnectionKeeper:
+    """等待期間維持瀏覽器與 HTTP 送出連線的熱度"""
+
+    def __init__(self, driver=None, connection=None, interval=KEEPALIVE_INTERVAL):
+        self.driver = driver
+        self.connection = connection
+        self.interval = interval
+        self._last_browser_ping = time.perf_counter()
+
+    def tick(self, timeout=None):
+        """到了間隔就送出保溫請求；timeout 限制 HTTP 保溫請求的等待時間"""
+        if self.connection is not None:
+            self.connection.keepalive(self.interval, timeout)
+        if self.driver is not None and time.perf_counter() - self._last_browser_ping >= self.interval:
+            try:
+                self.driver.execute_script(BROWSER_KEEPALIVE_SCRIPT)
+            except Exception:
+                pass
+            self._last_browser_ping = time.perf_counter()
+
+    def verify(self, timeout=None):
+        """送出前檢查 HTTP 連線，失效時重新連線（整體不超過 timeout 秒）；回傳連線是否可用"""
+        if self.connection is None:
+            return True
+        healthy = self.connection.ensure_healthy(timeout)
+        if healthy:
+            print("\n[連線] ✓ 送出連線狀態正常")
+        else:
+            print("\n[警告] 送出連線無法恢復，送出時將重新連線")
+        return healthy
+
+def get_form_response_url(form_url=FORM_URL):
+    """由表單網址推得 formResponse 送出網址"""
+    return form_url.rsplit('/', 1)[0] + "/formResponse"
+
+def is_submission_confirmed(page_text):
+    """檢查頁面內容是否為送出成功頁面"""
+    return any(marker in page_text for marker in SUCCESS_MARKERS)
+
+def build_form_payload(start_date, end_date, entry_ids=None, schema=None):
+    """組出 formResponse 所需的欄位資料
+
+    entry ID 未指定時由 FORM_ENTRY_IDS 與表單結構取得；
+    entry ID 不齊全時回傳 None，代表無法使用 HTTP 送出
+    """
+    if entry_ids is None:
+        entry_ids = get_entry_ids(schema)
+
+    if not all(entry_ids.get(field) for field in REQUIRED_ENTRY_FIELDS):
+        return None
+
+    def entry_key(field):
+        entry_id = str(entry_ids[field])
+        return entry_id if entry_id.startswith("entry.") else f"entry.{entry_id}"
+
+    payload = [
+        (entry_key("姓名"), FIXED_DATA['姓名']),
+        (entry_key("員工代號"), FIXED_DATA['員工代號']),
+        (entry_key("近假長假類型"), FIXED_DATA['近假長假類型']),
+        (entry_key("假別"), FIXED_DATA['假別']),
+        (entry_key("請假密碼"), FIXED_DATA['請假密碼']),
+    ]
+
+    # 日期欄位拆成年、月、日三個參數
+    for field, date_str in (("起始日期", start_date), ("結束日期", end_date)):
+        date = datetime.strptime(date_str, "%Y-%m-%d")
+        payload.append((f"{entry_key(field)}_year", str(date.year)))
+        payload.append((f"{entry_key(field)}_month", str(date.month)))
+        payload.append((f"{entry_key(field)}_day", str(date.day)))
+
+    checkbox_text = get_confirm_checkbox_text(schema)
+    if entry_ids.get("確認勾選") and checkbox_text:
+        payload.append((entry_key("確認勾選"), checkbox_text))
+
+    # 選填欄位有設定 entry ID 且有內容才送出
+    for field in ("補充事項", "長假號碼牌"):
+        if entry_ids.get(field) and FIXED_DATA.get(field):
+            payload.append((entry_key(field), FIXED_DATA[field]))
+
+    page_count = schema["page_count"] if schema else 1
+    payload.append(("fvv", "1"))
+    payload.append(("pageHistory", ",".join(str(page) for page in range(page_count))))
+    return payload
+
+class HttpSubmitter:
+    """不經瀏覽器，直接以 HTTP POST 送出表單
+
+    送出內容在建立時就已編碼完成，並透過預先建立的 WarmConnection 送出，
+    到點時只需送出一個請求。
+    """
+
+    def __init__(self, payload, form_url=FORM_URL, timeout=10):
+        self.url = urlsplit(get_form_response_url(form_url))
+        self.path = self.url.path + (f"?{self.url.query}" if self.url.query else "")
+        self.body = urlencode(payload).encode('utf-8')
+        self.headers = {
+            "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8",
+            "Content-Length": str(len(self.body)),
+            "Origin": f"{self.url.scheme}://{self.url.netloc}",
+            "Referer": form_url,
+            "Connection": "keep-alive",
+        }
+        self.connection = WarmConnection(form_url, timeout)
+
+    def connect(self):
+        """預先建立連線（DNS、TCP、TLS），避免送出時才握手；回傳各階段耗時"""
+        return self.connection.connect()
+
+    def submit(self):
+        """送出表單，回傳 (HTTP 狀態碼, 回應標頭, 回應內容)"""
+        status, headers, content = self.connection.request("POST", self.path, body=self.body,
+                                                           headers=self.headers)
+        return status, headers, content.decode('utf-8', errors='replace')
+
+    def close(self):
+        """關閉連線"""
+        self.connection.close()
+
+def prepare_http_submitter(start_date, end_date, form_url=FORM_URL, schema=None):
+    """依設定準備 HTTP 送出器並預先連線，無法使用時回傳 None"""
+    if SUBMIT_ENGINE != "http":
+        return None
+
+    payload = build_form_payload(start_date, end_date, schema=schema)
+    if payload is None:
+        print("[提示] 未設定完整的表單 entry ID，將使用瀏覽器送出")
+        return None
 
-    if is_ntp:
+    submitter = HttpSubmitter(payload, form_url=form_url)
+    try:
+        timings = submitter.connect()
+        print(f"[成功] 已預先建立 HTTP 送出連線"
+              f"（DNS {timings['dns_ms']:.0f} ms，連線 {timings['connect_ms']:.0f} ms）")
+    except Exception as e:
+        print(f"[警告] 無法預先建立連線（送出時會重試）: {e}")
+    return submitter
+
+def print_clock_status(clock):
+    """顯示時鐘同步結果"""
+    current_time = clock.now()
+    if clock.is_ntp:
         print(f"[成功] 已同步國家標準時間: {current_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
+        print(f"[同步] 伺服器 {clock.server}，偏移 {clock.offset * 1000:+.1f} ms，"
+              f"往返延遲 {clock.delay * 1000:.1f} ms，"
+              f"誤差上限 ±{clock.error_bound() * 1000:.1f} ms")
     else:
         print(f"[警告] 使用系統時間: {current_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
 
+def measure_fire_lead(form_url=FORM_URL, connection=None):
+    """量測網路延遲並決定要提前多少秒送出，讓請求抵達伺服器的時間對準目標
+
+    有預演的效能設定檔時，再加上本機從觸發到請求送出的延遲
+    """
+    if not LATENCY_COMPENSATION:
+        return 0.0
+
+    overhead = get_send_overhead(load_latency_profile(), "http" if connection is not None else "browser")
+    print("[校正中] 正在量測網路延遲...")
+    calibration = calibrate_latency(form_url, connection=connection)
+    if calibration is None:
+        if not overhead:
+            print("[警告] 無法量測網路延遲，將不提前送出")
+            return 0.0
+        print(f"[警告] 無法量測網路延遲，只依預演結果提前 {overhead * 1000:.1f} ms 送出")
+        return min(overhead, LATENCY_MAX_LEAD)
+
+    append_run_log("latency_calibration", send_overhead_ms=round(overhead * 1000, 3), **calibration)
+    lead = min(calibration['lead_ms'] / 1000 + overhead, LATENCY_MAX_LEAD)
+    connect = calibration['connect_min_ms']
+    print(f"[校正] 往返延遲最低 {calibration['rtt_min_ms']:.1f} ms / p50 {calibration['rtt_p50_ms']:.1f} ms"
+          + (f"（TCP 握手最低 {connect:.1f} ms）" if connect is not None else "")
+          + f"，提前 {lead * 1000:.1f} ms 送出"
+          + (f"（含預演量得的本機送出延遲 {overhead * 1000:.1f} ms）" if overhead else ""))
+    return lead
+
+class WaitWatchdog:
+    """長時間等待的監督
+
+    依剩餘時間定期重新同步時鐘（越接近送出越頻繁），並比對每次睡眠前後
+    本機時間與單調時鐘的進度，偵測系統休眠或系統時間被調整；偵測到時立即重新同步。
+    """
+
+    def __init__(self, clock, schedule=RESYNC_SCHEDULE, threshold=SUSPEND_THRESHOLD):
+        self.clock = clock
+        self.schedule = sorted(schedule, reverse=True)
+        self.threshold = threshold
+        self.last_sync = time.perf_counter()
+        self.suspected = False
+
+    def resync_interval(self, remaining):
+        """剩餘 remaining 秒時的重新同步間隔（秒）"""
+        for above, interval in self.schedule:
+            if remaining > above:
+                return interval
+        return self.schedule[-1][1]
+
+    def sleep(self, seconds):
+        """睡眠並檢查期間是否發生休眠或系統時間跳動"""
+        perf_start = time.perf_counter()
+        wall_start = time.time()
+        time.sleep(seconds)
+        self.observe(seconds, time.perf_counter() - perf_start, time.time() - wall_start)
+
+    def observe(self, seconds, perf_elapsed, wall_elapsed):
+        """比對一次睡眠預計與實際經過的時間，發現休眠或時間跳動時標記需要重新同步"""
+        overslept = max(perf_elapsed, wall_elapsed) - seconds
+        if overslept > self.threshold or abs(wall_elapsed - perf_elapsed) > self.threshold:
+            print(f"\n[警告] 偵測到系統休眠或時間跳動（預計睡眠 {seconds:.1f} 秒，"
+                  f"實際 {perf_elapsed:.1f} 秒／系統時間 {wall_elapsed:.1f} 秒）")
+            append_run_log("suspend_detected", requested_s=round(seconds, 3),
+                           perf_elapsed_s=round(perf_elapsed, 3), wall_elapsed_s=round(wall_elapsed, 3))
+            # 單調時鐘在休眠時可能停止計數，先以系統時間重設錨點
+            self.clock.reanchor()
+            self.suspected = True
+
+    def maybe_resync(self, remaining):
+        """到了同步間隔或偵測到休眠時重新同步，回傳是否有重新同步（需重新計算剩餘時間）"""
+        since_last = time.perf_counter() - self.last_sync
+        if not self.suspected and since_last < self.resync_interval(remaining):
+            return False
+
+        reason = "suspend" if self.suspected else "scheduled"
+        print(f"\n[同步中] 重新同步國家標準時間（距送出 {int(remaining)} 秒）...")
+        synced = self.clock.sync()
+        self.last_sync = time.perf_counter()
+        self.suspected = False
+        drift = self.clock.last_drift
+        if drift is not None:
+            print(f"[同步] 距上次同步 {since_last:.0f} 秒，時鐘漂移 {drift * 1000:+.1f} ms")
+        append_run_log("clock_resync", reason=reason, synced=synced, server=self.clock.server,
+                       since_last_s=round(since_last, 3), remaining_s=round(remaining, 3),
+                       drift_ms=round(drift * 1000, 3) if drift is not None else None)
+        return True
+
+def wait_and_submit(driver, target_time, submitter=None, clock=None, form_url=FORM_URL, standby=None):
+    """等待到指定時間並送出表單
+
+    實際觸發時刻會依網路延遲提前，使請求抵達伺服器時恰為目標時間；
+    有提供 standby 時，等待期間依排程重新檢查並重填表單。
+    回傳送出結果（同 submit_form）；目標時間已過或放棄送出時回傳 "failed"
+    """
+    if ASYNC_ORCHESTRATOR:
+        return wait_and_submit_async(driver, target_time, submitter, clock, form_url, standby)
+
+    print("\n[同步中] 正在同步國家標準時間...")
+    if clock is None:
+        clock = ClockSync()
+    clock.sync()
+    print_clock_status(clock)
+    current_time = clock.now()
+
     print(f"[目標] 送出時間: {target_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
 
     # 計算等待時間
@@ -493,68 +2548,415 @@ def wait_and_submit(driver, target_time):
 
     if time_diff < 0:
         print("\n[錯誤] 目標時間已過，無法執行")
-        return False
+        return "failed"
 
     print(f"\n[等待中] 距離送出還有 {int(time_diff)} 秒...")
 
+    # 等待期間維持瀏覽器與 HTTP 送出連線
+    connection = submitter.connection if submitter is not None else None
+    keeper = ConnectionKeeper(driver, connection)
+    handoff = max(CRITICAL_WINDOW_BEFORE, 0.1)
+
+    def run_standby(remaining):
+        """執行待命重填；表單無法恢復且沒有 HTTP 送出器時回傳 False（放棄送出）"""
+        nonlocal standby
+        if standby is None:
+            return True
+        try:
+            # 重填須在交給精確計時器前 FIRE_PREPARE_MARGIN 秒結束
+            standby.tick(remaining, remaining - handoff - FIRE_PREPARE_MARGIN)
+        except RuntimeError as e:
+            standby = None
+            return handle_standby_failure(e, submitter)
+        return True
+
     # 如果等待時間超過 60 秒，先粗略等待
     if time_diff > 60:
-        wait_time = time_diff - 60
-        print(f"[等待中] 粗略等待 {int(wait_time)} 秒...")
-        time.sleep(wait_time)
-        time_diff = 60
-
-    # 倒數 60 秒
+        print(f"[等待中] 粗略等待 {int(time_diff - 60)} 秒...")
+        watchdog = WaitWatchdog(clock)
+        with TELEMETRY.span("wait.coarse", seconds=round(time_diff - 60, 3)):
+            while True:
+                remaining = clock.seconds_until(target_time)
+                if remaining <= 60:
+                    break
+                # 定期或休眠喚醒後重新同步，並以新的時鐘重新計算剩餘時間
+                if watchdog.maybe_resync(remaining):
+                    continue
+                keeper.tick()
+                if not run_standby(remaining):
+                    return "failed"
+                sleep_time = min(KEEPALIVE_INTERVAL, clock.seconds_until(target_time) - 60)
+                if standby is not None:
+                    next_refill = standby.seconds_to_next(clock.seconds_until(target_time))
+                    if next_refill is not None:
+                        sleep_time = min(sleep_time, next_refill)
+                watchdog.sleep(max(sleep_time, 0.01))
+
+        # 進入最後一分鐘前重新取樣，校正長時間等待累積的漂移
+        print("[同步中] 重新同步國家標準時間...")
+        clock.sync()
+        print_clock_status(clock)
+
+    # 依網路延遲提前觸發時刻
+    with TELEMETRY.span("latency.calibrate") as meta:
+        lead = measure_fire_lead(form_url, connection)
+        meta["lead_ms"] = round(lead * 1000, 3)
+    fire_time = target_time - timedelta(seconds=lead)
+    time_diff = clock.seconds_until(fire_time)
+
+    # 倒數 60 秒（依伺服器時間對齊每一秒，不累積 sleep 誤差）
     if time_diff > 10:
-        wait_time = time_diff - 10
-        for remaining in range(int(wait_time), 0, -1):
-            print(f"\r[倒數中] {remaining} 秒...", end='', flush=True)
-            time.sleep(1)
+        with TELEMETRY.span("wait.countdown"):
+            while True:
+                remaining = clock.seconds_until(fire_time)
+                if remaining <= 10:
+                    break
+                print(f"\r[倒數中] {int(remaining - 10)} 秒...", end='', flush=True)
+                keeper.tick()
+                if not run_standby(remaining):
+                    return "failed"
+                remaining = clock.seconds_until(fire_time)
+                if remaining <= 10:
+                    break
+                time.sleep(min(remaining - 10, remaining % 1 or 1))
         print()
 
-    # 最後 10 秒精確倒數
+    # 最後 10 秒倒數顯示，進入關鍵時段（或剩 0.1 秒）時交由精確計時器
     print("\n[最後倒數]")
-    while True:
-        current_time, _ = get_ntp_time()
-        remaining = (target_time - current_time).total_seconds()
-
-        if remaining <= 0:
-            break
-
-        if remaining <= 10:
+    verified = False
+    validated = False
+    with TELEMETRY.span("wait.final"):
+        while True:
+            remaining = clock.seconds_until(fire_time)
+            if remaining <= handoff:
+                break
+            # 送出前的檢查都須在交接前 FIRE_PREPARE_MARGIN 秒結束
+            budget = remaining - handoff - FIRE_PREPARE_MARGIN
+            # 送出前讀回並驗證全部欄位，只重填不符的欄位
+            if not validated and standby is not None and remaining <= READBACK_BEFORE:
+                if budget > 0:
+                    standby.verify(min(READBACK_REFILL_BUDGET, budget))
+                validated = True
+                continue
+            if not verified and remaining <= HEALTH_CHECK_BEFORE:
+                if budget > 0:
+                    keeper.verify(budget)
+                verified = True
+                continue
+            if not verified and budget > 0:
+                keeper.tick(budget)
             print(f"\r  >>> {remaining:.3f} 秒 <<<", end='', flush=True)
+            time.sleep(min(0.05, remaining - handoff))
+
+    drain_performance_log(driver)
+    # 預先定位送出按鈕，到點時直接點擊（失敗重試時再依快取的選擇器重新定位）
+    button = SubmitButton(driver, form_url).prepare() if driver is not None else None
+    scheduler = DeadlineScheduler()
+    critical = CRITICAL_WINDOW_BEFORE > 0
+    if not critical:
+        print("\n\n[送出!] 正在提交表單...")
+
+    # 關鍵時段內不做垃圾回收，倒數改由背景執行緒顯示，送出後全部還原
+    with critical_window() if critical else nullcontext({}) as state:
+        countdown = CountdownDisplay(clock, fire_time).start() if critical else None
+        try:
+            with TELEMETRY.span("fire", **state) as meta:
+                result = scheduler.run_at(clock.deadline_ns(fire_time), submit_form, driver, clock, submitter,
+                                          button, standby)
+                meta.update(fire_error_us=round(scheduler.errors_ns[-1] / 1000, 3), result=result)
+        finally:
+            if countdown is not None:
+                countdown.stop()
+    print(f"[計時] 觸發誤差 {scheduler.errors_ns[-1] / 1000:.0f} µs")
+    return result
+
+def handle_standby_failure(error, submitter=None):
+    """待命重填失敗時決定是否繼續：有 HTTP 送出器就繼續，否則放棄"""
+    print(f"\n[錯誤] 待命期間表單失效且無法恢復: {error}")
+    if submitter is not None:
+        print("[提示] 將只以 HTTP 直接送出")
+        return True
+    print("[中止] 已在截止前放棄送出，請手動處理")
+    return False
 
-        # 精確等待
-        if remaining < 0.01:
-            break
-        elif remaining < 0.1:
-            time.sleep(0.001)
-        else:
-            time.sleep(0.01)
+def pick_timing_headers(headers):
+    """挑出與伺服器時間相關的回應標頭"""
+    lowered = {name.lower(): value for name, value in headers.items()}
+    return {name: lowered[name] for name in SERVER_TIMING_HEADERS if name in lowered}
 
-    # 送出表單
-    print("\n\n[送出!] 正在提交表單...")
+def drain_performance_log(driver):
+    """清空瀏覽器的網路事件紀錄，之後讀到的都是送出後的事件"""
     try:
-        submit_button = driver.find_element(By.XPATH, "//span[contains(text(), '提交') or contains(text(), '送出')]/ancestor::div[@role='button']")
-        submit_button.click()
+        driver.get_log("performance")
+    except Exception:
+        pass
 
-        actual_time, _ = get_ntp_time()
-        print(f"[成功] 表單已於 {actual_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} 送出！")
+def observe_form_response(driver, timeout=CONFIRM_TIMEOUT, request_timeout=None):
+    """觀察送出後的 DevTools 網路事件與網址變化，盡快得知送出結果
 
-        # 等待確認頁面
-        time.sleep(3)
+    有指定 request_timeout 時，超過該秒數仍沒有發出請求也沒有換頁就提早結束。
+    回傳 {status, headers, url_changed, request_wall_time}，取不到的項目為 None／空值
+    """
+    result = {"status": None, "headers": {}, "url_changed": False, "request_wall_time": None}
+    start = time.perf_counter()
+    deadline = start + timeout
+    url_changed_at = None
 
-        # 檢查是否成功
-        if "已記錄您的回應" in driver.page_source or "您的回應已記錄" in driver.page_source:
-            print("[成功] ✓ 表單提交成功！")
-            return True
-        else:
-            print("[警告] 無法確認提交狀態，請手動檢查")
-            return True
+    while time.perf_counter() < deadline:
+        try:
+            entries = driver.get_log("performance")
+        except Exception:
+            entries = []
+
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+            if method == "Network.requestWillBeSent":
+                if "formResponse" in params.get("request", {}).get("url", ""):
+                    result["request_wall_time"] = params.get("wallTime")
+            elif method == "Network.responseReceived":
+                response = params.get("response", {})
+                if "formResponse" in response.get("url", ""):
+                    result["status"] = response.get("status")
+                    result["headers"] = pick_timing_headers(response.get("headers", {}))
+                    return result
+
+        # 網址已變成 formResponse 卻遲遲沒有網路事件時，不再空等
+        if url_changed_at is None:
+            try:
+                if "formResponse" in driver.current_url:
+                    url_changed_at = time.perf_counter()
+                    result["url_changed"] = True
+            except Exception:
+                pass
+        elif time.perf_counter() - url_changed_at > 1:
+            return result
+
+        if (request_timeout is not None and result["request_wall_time"] is None and url_changed_at is None
+                and time.perf_counter() - start > request_timeout):
+            return result
+
+        time.sleep(0.005)
+    return result
+
+def record_submission(engine, confirmed, status, latency_ms, fired_at, headers=None, **extra):
+    """顯示並記錄送出結果"""
+    timing = "，".join(f"{name}: {value}" for name, value in (headers or {}).items())
+    print(f"[確認] 送出到確認耗時 {latency_ms:.0f} ms（HTTP {status if status is not None else '未知'}）"
+          + (f"，{timing}" if timing else ""))
+    append_run_log("submission", engine=engine, confirmed=confirmed, status=status,
+                   latency_ms=round(latency_ms, 3), fired_at=fired_at.isoformat(timespec='microseconds'),
+                   headers=headers or {}, **extra)
+
+class SubmitButton:
+    """預先定位並保留的送出按鈕
+
+    送出前先找到按鈕並保留元素，到點時直接點擊；元素失效（頁面重繪或重新載入）時，
+    依選擇器快取中上次命中的選擇器重新定位。
+    """
 
+    FIELD = "送出按鈕"
+
+    def __init__(self, driver, form_url=FORM_URL):
+        self.driver = driver
+        self.cache = SelectorCache(form_url, selectors={self.FIELD: SUBMIT_BUTTON_SELECTORS})
+        self.element = None
+
+    def resolve(self):
+        """依候選選擇器重新定位按鈕，找不到時拋出 RuntimeError"""
+        start = time.perf_counter()
+        cached = self.cache.get(self.FIELD)
+        self.element = None
+        for selector in self.cache.ordered_selectors(self.FIELD):
+            for element in self.driver.find_elements(By.XPATH, selector):
+                if element.is_displayed() and element.is_enabled():
+                    self.element = element
+                    if selector != cached:
+                        self.cache.record(self.FIELD, selector, (time.perf_counter() - start) * 1000)
+                    return element
+        self.cache.invalidate(self.FIELD)
+        raise RuntimeError("找不到送出按鈕")
+
+    def prepare(self):
+        """送出前預先定位並寫回快取；找不到時只提示，送出時會再定位一次"""
+        try:
+            self.resolve()
+        except Exception as e:
+            print(f"\n[警告] 無法預先定位送出按鈕: {e}")
+        finally:
+            self.cache.save()
+        return self
+
+    def click(self):
+        """點擊按鈕；保留的元素失效時重新定位後再點擊一次"""
+        if self.element is None:
+            self.resolve()
+        try:
+            self.element.click()
+        except StaleElementReferenceException:
+            self.resolve().click()
+
+def submit_via_http(submitter, clock):
+    """以 HTTP 直接送出一次，回傳 (結果, 錯誤訊息, 送出紀錄)
+
+    結果為 "confirmed"（確認成功）、"failed"（確認失敗，可以重送）或
+    "unknown"（請求已送出卻沒有收到回應，或伺服器已接受（2xx）但回應頁面不是預期的成功頁面，
+    重送可能造成重複送出）；送出紀錄為 record_submission 的參數，沒有收到回應時為 None
+    """
+    fired = time.perf_counter()
+    try:
+        with TELEMETRY.span("submit.http") as meta:
+            status, headers, content = submitter.submit()
+            meta["status"] = status
     except Exception as e:
-        print(f"[錯誤] 送出表單時發生錯誤: {e}")
-        return False
+        # 請求已完整送出就可能已被處理，不論錯誤種類都不重送
+        submitter.close()
+        if submitter.connection.request_sent:
+            return "unknown", str(e), None
+        return "failed", str(e), None
+    latency_ms = (time.perf_counter() - fired) * 1000
+
+    confirmed = status == 200 and is_submission_confirmed(content)
+    record = {"engine": "http", "confirmed": confirmed, "status": status, "latency_ms": latency_ms,
+              "fired_at": clock.now(), "headers": pick_timing_headers(headers)}
+    if confirmed:
+        return "confirmed", None, record
+    if 200 <= status < 300:
+        # 例如自訂的確認訊息或非中文介面：伺服器已接受，只是認不出成功頁面
+        return "unknown", f"伺服器已接受送出（狀態碼 {status}），但回應不是預期的成功頁面", record
+    return "failed", f"HTTP 送出未確認成功（狀態碼 {status}）", record
+
+def submit_via_browser(driver, clock, button):
+    """以瀏覽器點擊送出一次，回傳 (結果, 錯誤訊息, 送出紀錄)（同 submit_via_http）"""
+    try:
+        click_wall_time = time.time()
+        fired = time.perf_counter()
+        with TELEMETRY.span("submit.click"):
+            button.click()
+    except Exception as e:
+        return "failed", f"無法點擊送出按鈕: {e}", None
+    actual_time = clock.now()
+
+    # 觀察 formResponse 的網路回應，取代固定等待後掃描頁面
+    with TELEMETRY.span("submit.confirm") as meta:
+        observed = observe_form_response(driver, request_timeout=SUBMIT_REQUEST_TIMEOUT)
+        click_to_request_ms = None
+        if observed["request_wall_time"] is not None:
+            click_to_request_ms = round((observed["request_wall_time"] - click_wall_time) * 1000, 3)
+        meta.update(status=observed["status"], url_changed=observed["url_changed"],
+                    click_to_request_ms=click_to_request_ms)
+    latency_ms = (time.perf_counter() - fired) * 1000
+    status = observed["status"]
+    if status is not None:
+        confirmed = 200 <= status < 300
+    else:
+        confirmed = observed["url_changed"] and is_submission_confirmed(driver.page_source)
+
+    record = {"engine": "browser", "confirmed": confirmed, "status": status, "latency_ms": latency_ms,
+              "fired_at": actual_time, "headers": observed["headers"], "click_to_request_ms": click_to_request_ms}
+    if confirmed:
+        return "confirmed", None, record
+    if status is not None:
+        return "failed", f"伺服器回應狀態碼 {status}，表單未送出", record
+    if observed["url_changed"]:
+        # 已換到 formResponse 頁面卻認不出成功頁面（例如自訂的確認訊息）：表單可能已送出，不重送
+        return "unknown", "已送出但回應不是預期的成功頁面", record
+    if observed["request_wall_time"] is None:
+        # 點擊可能只是較晚才發出請求，此時改用 HTTP 或再點一次都可能重複送出
+        return "unknown", f"點擊後 {SUBMIT_REQUEST_TIMEOUT:.1f} 秒內沒有觀察到送出請求", record
+    return "unknown", "已發出送出請求但沒有收到回應", record
+
+def report_submit_attempts(attempts):
+    """送出結束後才顯示每次嘗試的結果並寫入執行紀錄"""
+    for attempt in attempts:
+        record = attempt.pop("record")
+        if attempt["outcome"] == "confirmed":
+            via = " 以 HTTP" if record["engine"] == "http" else ""
+            print(f"[成功] 表單已於 {record['fired_at'].strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}{via} 送出！")
+        if record is not None:
+            record_submission(**record)
+        if attempt["outcome"] == "failed":
+            print(f"[錯誤] 第 {attempt['attempt']} 次送出失敗（{attempt['engine']}）: {attempt['error']}")
+        append_run_log("submit_attempt", **attempt)
+
+def submit_form(driver, clock, submitter=None, button=None, standby=None, budget=SUBMIT_RETRY_BUDGET):
+    """立即送出表單，失敗時在時間預算內快速重試
+
+    有提供 submitter 時先以 HTTP 直接送出，確認失敗後與瀏覽器點擊輪流重試；
+    每次確認失敗只重送一次，送出結果不明（可能已成功）時不再重送，避免重複送出。
+    瀏覽器送出後頁面已離開表單時，以 standby 在預算內重新載入並重填。
+    重試期間只在事件緩衝區留下紀錄，全部嘗試結束後才顯示訊息並寫入執行紀錄。
+    回傳送出結果："confirmed"（確認成功）、"unknown"（可能已送出，請手動確認）或 "failed"
+    """
+    load_browser_modules()
+    if button is None and driver is not None:
+        button = SubmitButton(driver)
+    engines = [engine for engine, available in (("http", submitter is not None), ("browser", button is not None))
+               if available]
+    if not engines:
+        print("[錯誤] 沒有可用的送出方式")
+        return "failed"
+
+    start = time.perf_counter()
+    end = start + budget
+    attempts = []
+    result = "failed"
+    summary = None
+    try:
+        while True:
+            engine = engines[len(attempts) % len(engines)]
+            # 重試瀏覽器送出前確認頁面仍是表單，已離開（例如表單逾時的錯誤頁）就重新載入並重填
+            if (engine == "browser" and attempts and standby is not None
+                    and not is_form_page_valid(driver, standby.form_url,
+                                               min(OPTIONAL_FIELD_TIMEOUT, end - time.perf_counter()))):
+                with TELEMETRY.span("submit.restore") as meta:
+                    meta["restored"] = standby.restore(end)
+                if not meta["restored"]:
+                    engines.remove("browser")
+                    summary = "[錯誤] 表單頁面已失效且無法在時間內恢復"
+                    if not engines or time.perf_counter() >= end:
+                        break
+                    continue
+
+            attempt_start = time.perf_counter()
+            started_at = clock.now()
+            if engine == "http":
+                outcome, error, record = submit_via_http(submitter, clock)
+            else:
+                outcome, error, record = submit_via_browser(driver, clock, button)
+            attempts.append({"attempt": len(attempts) + 1, "engine": engine, "outcome": outcome, "error": error,
+                             "started_at": started_at.isoformat(timespec='microseconds'),
+                             "offset_ms": round((attempt_start - start) * 1000, 3),
+                             "elapsed_ms": round((time.perf_counter() - attempt_start) * 1000, 3),
+                             "record": record})
+            TELEMETRY.event("submit.attempt", attempt=len(attempts), engine=engine, outcome=outcome, error=error)
+
+            if outcome == "confirmed":
+                result = outcome
+                summary = "[成功] ✓ 表單提交成功！"
+                break
+            if outcome == "unknown":
+                result = outcome
+                summary = f"[警告] {error}，無法確認提交狀態，為避免重複送出不再重試，請手動檢查"
+                break
+
+            backoff = SUBMIT_RETRY_BACKOFF[min(len(attempts) - 1, len(SUBMIT_RETRY_BACKOFF) - 1)]
+            if time.perf_counter() + backoff >= end:
+                summary = f"[錯誤] 已用完 {budget:.1f} 秒的重試時間，共嘗試 {len(attempts)} 次"
+                break
+            if backoff > 0:
+                time.sleep(backoff)
+    finally:
+        if submitter is not None:
+            submitter.close()
+        report_submit_attempts(attempts)
+    if summary:
+        print(summary)
+    return result
 
 def run_leave_form():
     """執行請假表單填寫"""
@@ -567,20 +2969,55 @@ def run_leave_form():
         return
 
     driver = None
+    clock = None
+    TELEMETRY.start_run()
     try:
+        # 取得表單結構，提早發現表單改版
+        print("\n[檢查中] 正在取得表單結構...")
+        with TELEMETRY.span("form_schema"):
+            schema = load_form_schema(refresh=True)
+
+        # 有預演的效能設定檔時，等到需要的時候才啟動瀏覽器
+        prepare_before = get_prepare_before(load_latency_profile())
+        if prepare_before is not None:
+            clock = ClockSync()
+            print("\n[同步中] 正在同步國家標準時間...")
+            clock.sync()
+            print_clock_status(clock)
+            prepare_time = target_time - timedelta(seconds=prepare_before)
+            if clock.seconds_until(prepare_time) > 0:
+                print(f"[排程] 依預演結果，將於 {prepare_time.strftime('%Y-%m-%d %H:%M:%S')} "
+                      f"開始啟動瀏覽器並填寫表單（送出前 {prepare_before:.0f} 秒）")
+                sleep_until(clock, prepare_time)
+            else:
+                print(f"[警告] 距離送出不到預演建議的準備時間（{prepare_before:.0f} 秒）")
+
         # 設定瀏覽器
         driver = setup_driver()
 
         # 填寫表單
-        if not fill_form(driver, start_date, end_date):
+        if not fill_form(driver, start_date, end_date, schema=schema):
             print("\n[失敗] 表單填寫失敗")
             return
 
-        # 等待並送出
-        if wait_and_submit(driver, target_time):
+        # 準備 HTTP 直接送出（瀏覽器已填好的表單作為備援）
+        submitter = prepare_http_submitter(start_date, end_date, schema=schema)
+
+        # 待命期間依排程重新檢查並重填表單（已延後準備時，略過準備前的排程）
+        offsets = STANDBY_REFILL_OFFSETS
+        if prepare_before is not None:
+            offsets = [offset for offset in offsets if offset < prepare_before]
+        standby = StandbyRefresher(driver, start_date, end_date, schema=schema, offsets=offsets)
+
+        # 等待並送出；截止後由背景執行緒保存送出後的頁面與事件紀錄
+        outcome = wait_and_submit(driver, target_time, submitter, clock, standby=standby)
+        DIAGNOSTICS.capture(driver, "submit_failed" if outcome == "failed" else "submitted")
+        if outcome == "confirmed":
             print("\n" + "=" * 60)
             print("             任務完成！")
             print("=" * 60)
+        elif outcome == "unknown":
+            print("\n[待確認] 表單可能已送出，請到表單或信箱確認是否已收到回應")
         else:
             print("\n[失敗] 表單送出失敗")
 
@@ -594,10 +3031,935 @@ def run_leave_form():
         print(f"\n[錯誤] 程式執行錯誤: {e}")
         import traceback
         traceback.print_exc()
+        DIAGNOSTICS.capture(driver, "error", e)
     finally:
+        DIAGNOSTICS.wait()
         if driver:
             driver.quit()
             print("[關閉] 瀏覽器已關閉")
+        TELEMETRY.flush()
+
+# ==================== 非同步協調 ====================
+
+class SubmitOrchestrator:
+    """以 asyncio 事件迴圈協調等待期間的各項工作
+
+    時鐘重新同步、連線與頁面保溫、待命重填與送出前驗證、倒數顯示同時進行；
+    會阻塞的 Selenium 與網路呼叫都交給執行緒池，所有瀏覽器操作在同一條執行緒上依序執行。
+    觸發由專用執行緒以精確計時器完成，進入關鍵時段前先停止倒數以外的背景工作；
+    觸發執行緒不會等待瀏覽器執行緒上仍在執行的呼叫，送出前的檢查也都有在交接前結束的逾時，
+    因此即使事件迴圈或執行緒池被拖慢也不會延誤觸發時刻；觸發時瀏覽器執行緒仍忙碌，就只以 HTTP 送出。
+    """
+
+    def __init__(self, clock, target_time, fire, driver=None, submitter=None, form_url=FORM_URL,
+                 standby=None, lead=None, background=(), button=None):
+        self.clock = clock
+        self.target_time = target_time
+        self.fire = fire                        # 觸發時刻在專用執行緒以「瀏覽器是否空閒」呼叫，回傳送出結果
+        self.driver = driver
+        self.submitter = submitter
+        self.form_url = form_url
+        self.standby = standby
+        self.lead = lead                        # 有指定時不量測網路延遲
+        self.background = list(background)      # 額外的背景工作（接受本物件的協程函式）
+        self.button = button                    # 觸發前預先定位的送出按鈕
+        self.fire_time = None
+        self.handoff = max(CRITICAL_WINDOW_BEFORE, 0.1)   # 觸發前幾秒交給觸發執行緒
+        self.give_up = False
+        self.aborted = threading.Event()
+        self.scheduler = DeadlineScheduler()
+        self.connection = submitter.connection if submitter is not None else None
+        self.keeper = ConnectionKeeper(driver, self.connection)
+        self.watchdog = WaitWatchdog(clock)
+        self._browser_pool = ThreadPoolExecutor(max_workers=1)
+        self._browser_lock = threading.Lock()           # 瀏覽器執行緒正在執行呼叫時持有
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+        self._fire_pool = ThreadPoolExecutor(max_workers=1)
+
+    def remaining(self):
+        """距離觸發時刻（尚未決定時為目標時間）的秒數"""
+        return self.clock.seconds_until(self.fire_time or self.target_time)
+
+    async def in_browser(self, func, *args):
+        """在瀏覽器執行緒執行會阻塞的呼叫（瀏覽器與送出連線的操作都在此依序執行）"""
+        return await asyncio.get_running_loop().run_in_executor(self._browser_pool, self._run_locked, func, *args)
+
+    def _run_locked(self, func, *args):
+        """持有瀏覽器鎖執行呼叫，讓觸發執行緒得知瀏覽器是否忙碌"""
+        with self._browser_lock:
+            return func(*args)
+
+    def check_budget(self):
+        """送出前的檢查可用的秒數：須在交給觸發執行緒前 FIRE_PREPARE_MARGIN 秒結束"""
+        return self.remaining() - self.handoff - FIRE_PREPARE_MARGIN
+
+    async def in_io(self, func, *args):
+        """在網路執行緒池執行會阻塞的呼叫"""
+        return await asyncio.get_running_loop().run_in_executor(self._io_pool, func, *args)
+
+    async def wait_until(self, target_time, before=0.0):
+        """等待到目標時間前 before 秒；放棄送出時回傳 False"""
+        while not self.give_up:
+            remaining = self.clock.seconds_until(target_time) - before
+            if remaining <= 0:
+                return True
+            await asyncio.sleep(min(remaining, 1.0))
+        return False
+
+    async def run(self):
+        """等待並送出，回傳送出結果；目標時間已過或放棄送出時回傳 "failed"（見 submit_form）"""
+        tasks = []
+        try:
+            await self.in_io(self.clock.sync)
+            print_clock_status(self.clock)
+            print(f"[目標] 送出時間: {self.target_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
+            if self.remaining() < 0:
+                print("\n[錯誤] 目標時間已過，無法執行")
+                return "failed"
+            print(f"\n[等待中] 距離送出還有 {int(self.remaining())} 秒...")
+
+            countdown = asyncio.ensure_future(self.countdown_loop())
+            tasks = [asyncio.ensure_future(coroutine) for coroutine in
+                     (self.resync_loop(), self.keepalive_loop(), self.standby_loop())]
+            tasks += [asyncio.ensure_future(factory(self)) for factory in self.background]
+            result = await self.fire_task(tasks)
+            await countdown
+            return result
+        finally:
+            # 中斷時通知觸發執行緒不要送出，並取消所有背景工作
+            self.aborted.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for pool in (self._browser_pool, self._io_pool, self._fire_pool):
+                pool.shutdown(wait=False)
+
+    async def fire_task(self, tasks):
+        """決定觸發時刻，進入關鍵時段後交由專用執行緒準時送出"""
+        # 進入最後一分鐘前重新同步，再依網路延遲決定觸發時刻
+        if self.remaining() > 60:
+            if not await self.wait_until(self.target_time, 60):
+                return "failed"
+            print("\n[同步中] 重新同步國家標準時間...")
+            await self.in_io(self.clock.sync)
+            print_clock_status(self.clock)
+
+        if self.lead is None:
+            with TELEMETRY.span("latency.calibrate") as meta:
+                lead = await self.in_browser(measure_fire_lead, self.form_url, self.connection)
+                meta["lead_ms"] = round(lead * 1000, 3)
+        else:
+            lead = self.lead
+        self.fire_time = self.target_time - timedelta(seconds=lead)
+
+        with TELEMETRY.span("wait.async"):
+            if not await self.wait_until(self.fire_time, self.handoff):
+                return "failed"
+
+        # 停止倒數以外的背景工作，觸發不與它們爭用瀏覽器或 CPU
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.give_up:
+            return "failed"
+        deadline_ns = self.clock.deadline_ns(self.fire_time)
+        return await asyncio.get_running_loop().run_in_executor(self._fire_pool, self.fire_at, deadline_ns)
+
+    def prepare_browser(self, deadline_ns):
+        """在觸發執行緒清空效能紀錄並預先定位送出按鈕
+
+        不排在瀏覽器執行緒後面：已取消的背景工作若仍在瀏覽器執行緒上執行，
+        或距離觸發已不到 FIRE_PREPARE_MARGIN 秒，就略過（送出時會再定位按鈕）
+        """
+        steps = []
+        if self.driver is not None:
+            steps.append(("drain", lambda: drain_performance_log(self.driver)))
+        if self.button is not None:
+            steps.append(("button", self.button.prepare))
+        if not steps:
+            return
+        if not self._browser_lock.acquire(blocking=False):
+            TELEMETRY.event("fire.prepare", skipped="browser_busy")
+            return
+        try:
+            for name, step in steps:
+                if deadline_ns - time.perf_counter_ns() < FIRE_PREPARE_MARGIN * 1e9:
+                    TELEMETRY.event("fire.prepare", skipped=name, reason="deadline")
+                    return
+                step()
+        finally:
+            self._browser_lock.release()
+
+    def fire_at(self, deadline_ns):
+        """在專用執行緒中進入關鍵時段，於 deadline_ns 觸發；已中斷時不送出"""
+        self.prepare_browser(deadline_ns)
+        critical = CRITICAL_WINDOW_BEFORE > 0
+        with critical_window() if critical else nullcontext({}) as state:
+            with TELEMETRY.span("fire", **state) as meta:
+                self.scheduler.wait_until(deadline_ns)
+                if self.aborted.is_set():
+                    meta["aborted"] = True
+                    return "failed"
+                # 已取消的背景工作仍佔用瀏覽器時，由 fire 決定避開瀏覽器
+                browser_free = not self._browser_lock.locked()
+                result = self.fire(browser_free)
+                meta.update(browser_free=browser_free,
+                            fire_error_us=round(self.scheduler.errors_ns[-1] / 1000, 3), result=result)
+        print(f"[計時] 觸發誤差 {self.scheduler.errors_ns[-1] / 1000:.0f} µs")
+        return result
+
+    async def resync_loop(self):
+        """依剩餘時間定期重新同步時鐘，並偵測系統休眠（最後一分鐘的同步由 fire_task 負責）"""
+        while self.clock.seconds_until(self.target_time) > 90:
+            perf_start = time.perf_counter()
+            wall_start = time.time()
+            await asyncio.sleep(1.0)
+            self.watchdog.observe(1.0, time.perf_counter() - perf_start, time.time() - wall_start)
+            remaining = self.clock.seconds_until(self.target_time)
+            if remaining > 90:
+                await self.in_io(self.watchdog.maybe_resync, remaining)
+
+    async def keepalive_loop(self):
+        """維持瀏覽器與送出連線的熱度，送出前檢查連線"""
+        while self.remaining() > HEALTH_CHECK_BEFORE:
+            await self.in_browser(self.keeper.tick, self.check_budget())
+            await asyncio.sleep(min(1.0, max(self.remaining() - HEALTH_CHECK_BEFORE, 0.01)))
+        if self.check_budget() > 0:
+            await self.in_browser(self.keeper.verify, self.check_budget())
+
+    async def standby_loop(self):
+        """依排程重填表單，送出前讀回驗證全部欄位"""
+        if self.standby is None:
+            return
+        while self.remaining() > READBACK_BEFORE:
+            try:
+                await self.in_browser(self.standby.tick, self.remaining(), self.check_budget())
+            except RuntimeError as e:
+                self.give_up = not handle_standby_failure(e, self.submitter)
+                return
+            wait = self.remaining() - READBACK_BEFORE
+            next_refill = self.standby.seconds_to_next(self.remaining())
+            if next_refill is not None:
+                wait = min(wait, next_refill)
+            await asyncio.sleep(min(max(wait, 0.01), 1.0))
+        budget = min(READBACK_REFILL_BUDGET, self.check_budget())
+        if budget > 0:
+            await self.in_browser(self.standby.verify, budget)
+
+    async def countdown_loop(self):
+        """低頻率顯示倒數：最後 10 秒每 COUNTDOWN_RENDER_INTERVAL 秒更新，其餘每秒更新；觸發前停止"""
+        while not self.give_up:
+            remaining = self.remaining()
+            if self.fire_time is not None and remaining <= 0.1:
+                print("\n\n[送出!] 正在提交表單...", flush=True)
+                return
+            if remaining > 10:
+                print(f"\r[倒數中] {int(remaining)} 秒...  ", end='', flush=True)
+                interval = 1.0
+            else:
+                print(f"\r  >>> {remaining:.3f} 秒 <<<", end='', flush=True)
+                interval = COUNTDOWN_RENDER_INTERVAL
+            await asyncio.sleep(min(interval, max(remaining - 0.1, 0.01)))
+
+def wait_and_submit_async(driver, target_time, submitter=None, clock=None, form_url=FORM_URL, standby=None):
+    """wait_and_submit 的 asyncio 版本（見 SubmitOrchestrator）；Ctrl+C 時取消所有工作且不會送出"""
+    load_async_module()
+    if clock is None:
+        clock = ClockSync()
+    print("\n[同步中] 正在同步國家標準時間...")
+    button = SubmitButton(driver, form_url) if driver is not None else None
+
+    def fire(browser_free):
+        if browser_free or submitter is None:
+            return submit_form(driver, clock, submitter, button, standby)
+        # 瀏覽器執行緒仍在執行呼叫：只以 HTTP 送出，不與它同時操作瀏覽器
+        return submit_form(None, clock, submitter)
+
+    orchestrator = SubmitOrchestrator(clock, target_time, fire, driver, submitter, form_url, standby, button=button)
+    return asyncio.run(orchestrator.run())
+
+def self_check_orchestrator(runs=3, tolerance_ms=2.0, delay=4):
+    """自我檢查：注入緩慢的背景工作，確認不會延誤觸發時刻
+
+    注入的工作會直接阻塞事件迴圈、佔用瀏覽器與網路執行緒，並在執行緒池中持續佔用 CPU，
+    其中一項在交給觸發執行緒前才開始、執行到觸發之後；觸發前也會預先定位送出按鈕（以空的替代物件），
+    確認觸發不需等待瀏覽器執行緒。與沒有背景負載時比較觸發誤差，負載下的最大誤差不超過 tolerance_ms 即通過
+    """
+    load_async_module()
+
+    class IdleButton:
+        """代替送出按鈕：預先定位時不做任何事"""
+
+        def prepare(self):
+            return self
+
+    def burn(seconds):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+
+    async def block_event_loop(orchestrator):
+        while True:
+            time.sleep(0.25)
+            await asyncio.sleep(0.05)
+
+    async def occupy_pools(orchestrator):
+        while True:
+            await asyncio.gather(orchestrator.in_browser(time.sleep, 0.5),
+                                 orchestrator.in_io(burn, 0.2))
+
+    async def overlap_handoff(orchestrator):
+        # 在交給觸發執行緒前 0.5 秒開始一項比剩餘時間更久的瀏覽器與網路呼叫
+        while orchestrator.fire_time is None or orchestrator.remaining() > orchestrator.handoff + 0.5:
+            await asyncio.sleep(0.05)
+        await asyncio.gather(orchestrator.in_browser(time.sleep, delay), orchestrator.in_io(time.sleep, delay))
+
+    print(f"[檢查] 非同步協調觸發誤差（各 {runs} 次，每次 {delay} 秒後觸發）")
+    clock = ClockSync(servers=[])
+    results = {}
+    loads = (block_event_loop, occupy_pools, overlap_handoff)
+    for label, background in (("無背景負載", ()), ("注入緩慢背景工作", loads)):
+        errors_us = []
+        for _ in range(runs):
+            target_time = clock.now() + timedelta(seconds=delay)
+            orchestrator = SubmitOrchestrator(clock, target_time, lambda browser_free: True, lead=0.0, background=background,
+                                              button=IdleButton())
+            asyncio.run(orchestrator.run())
+            errors_us.append(orchestrator.scheduler.errors_ns[-1] / 1000)
+        results[label] = errors_us
+
+    print("\n[結果] 觸發誤差：")
+    for label, errors_us in results.items():
+        print(f"  {label}：p50 {percentile(errors_us, 50):.1f} µs / 最大 {max(errors_us):.1f} µs")
+    passed = max(results["注入緩慢背景工作"]) <= tolerance_ms * 1000
+    if passed:
+        print(f"[成功] ✓ 背景工作未延誤觸發（容許 {tolerance_ms:.1f} ms）")
+    else:
+        print(f"[錯誤] 背景工作使觸發誤差超過 {tolerance_ms:.1f} ms")
+    return passed
+
+# ==================== 批次排程 ====================
+
+def load_batch_config(path):
+    """讀取批次設定檔（JSON；Python 3.11 以上也可使用 TOML）
+
+    回傳 (送出項目列表, 結果檔路徑)，設定有誤時拋出 ValueError
+    """
+    if path.lower().endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError("讀取 TOML 設定檔需要 Python 3.11 以上，請改用 JSON")
+        with open(path, 'rb') as f:
+            config = tomllib.load(f)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+    entries = config.get("submissions") if isinstance(config, dict) else None
+    if not entries:
+        raise ValueError("設定檔中沒有 submissions")
+
+    jobs = []
+    for index, entry in enumerate(entries, 1):
+        missing = [key for key in ("target_time", "start_date", "end_date") if key not in entry]
+        if missing:
+            raise ValueError(f"第 {index} 筆缺少 {', '.join(missing)}")
+        target_time = entry["target_time"]
+        if isinstance(target_time, datetime):
+            # TOML 的日期時間值直接使用；有時區時換算成本機時間
+            if target_time.tzinfo is not None:
+                target_time = target_time.astimezone().replace(tzinfo=None)
+        else:
+            target_time = parse_target_time(str(target_time))
+        if target_time is None:
+            raise ValueError(f"第 {index} 筆的 target_time 格式錯誤")
+        start_date = str(entry["start_date"])
+        end_date = str(entry["end_date"])
+        try:
+            datetime.strptime(start_date, "%Y-%m-%d")
+            datetime.strptime(end_date, "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"第 {index} 筆的日期格式錯誤（應為 YYYY-MM-DD）")
+        jobs.append({
+            "name": str(entry.get("name") or f"#{index}"),
+            "target_time": target_time,
+            "start_date": start_date,
+            "end_date": end_date,
+        })
+
+    results_path = config.get("results") or os.path.splitext(path)[0] + ".results.json"
+    return jobs, os.path.abspath(results_path)
+
+def batch_result(job, status, **extra):
+    """批次中一筆送出的結果紀錄"""
+    result = {
+        "name": job["name"],
+        "target_time": job["target_time"].isoformat(timespec='milliseconds'),
+        "start_date": job["start_date"],
+        "end_date": job["end_date"],
+        "status": status,
+        "finished_at": datetime.now().isoformat(timespec='milliseconds'),
+    }
+    result.update(extra)
+    return result
+
+def sleep_until(clock, target_time, keeper=None):
+    """等待到指定時間（伺服器時間），期間維持連線熱度，並定期重新同步時鐘"""
+    watchdog = WaitWatchdog(clock)
+    while True:
+        remaining = clock.seconds_until(target_time)
+        if remaining <= 0:
+            return
+        if watchdog.maybe_resync(remaining):
+            continue
+        if keeper is not None:
+            keeper.tick()
+        watchdog.sleep(min(remaining, KEEPALIVE_INTERVAL))
+
+def run_batch_job(driver, clock, job, schema=None, keeper=None):
+    """執行批次中的一筆送出：到準備時間才填寫表單，再定時送出，回傳結果紀錄"""
+    target_time = job["target_time"]
+    print("\n" + "=" * 60)
+    print(f"[排程] {job['name']}：{job['start_date']} ~ {job['end_date']}，"
+          f"送出時間 {target_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
+    print("=" * 60)
+    if clock.seconds_until(target_time) <= 0:
+        print("[錯誤] 目標時間已過，略過此筆")
+        return batch_result(job, "missed")
+
+    # 有預演的效能設定檔時依填寫耗時決定準備時間（瀏覽器已啟動，不計啟動時間）
+    prepare_before = get_prepare_before(load_latency_profile(), launch=False) or BATCH_PREPARE_BEFORE
+    prepare_time = target_time - timedelta(seconds=prepare_before)
+    if clock.seconds_until(prepare_time) > 0:
+        print(f"[排程] 將於 {prepare_time.strftime('%Y-%m-%d %H:%M:%S')} 開始填寫表單")
+        sleep_until(clock, prepare_time, keeper)
+
+    TELEMETRY.start_run()
+    try:
+        if not fill_form(driver, job["start_date"], job["end_date"], schema=schema):
+            return batch_result(job, "fill_failed")
+        submitter = prepare_http_submitter(job["start_date"], job["end_date"], schema=schema)
+        offsets = [offset for offset in STANDBY_REFILL_OFFSETS if offset < prepare_before]
+        standby = StandbyRefresher(driver, job["start_date"], job["end_date"], schema=schema, offsets=offsets)
+        outcome = wait_and_submit(driver, target_time, submitter, clock, standby=standby)
+        DIAGNOSTICS.capture(driver, "submit_failed" if outcome == "failed" else "submitted")
+        # 結果不明（可能已送出）另外記為 unknown，需要人工確認
+        status = {"confirmed": "submitted", "unknown": "unknown"}.get(outcome, "failed")
+        return batch_result(job, status)
+    except Exception as e:
+        print(f"\n[錯誤] {job['name']} 執行錯誤: {e}")
+        DIAGNOSTICS.capture(driver, "error", e)
+        return batch_result(job, "error", error=str(e))
+    finally:
+        # 下一筆使用瀏覽器前先等事後分析資料寫完
+        DIAGNOSTICS.wait()
+        TELEMETRY.flush()
+
+def run_batch(config_path):
+    """依設定檔排程多筆送出，共用同一個時鐘同步狀態與瀏覽器，結果寫入結果檔
+
+    回傳程式結束代碼：全部送出成功為 0，否則為 1
+    """
+    try:
+        jobs, results_path = load_batch_config(config_path)
+    except (OSError, ValueError) as e:
+        print(f"[錯誤] 無法讀取設定檔: {e}")
+        return 1
+
+    print(f"[排程] 共 {len(jobs)} 筆送出：")
+    for job in sorted(jobs, key=lambda job: job["target_time"]):
+        print(f"  {job['target_time'].strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}  "
+              f"{job['name']}（{job['start_date']} ~ {job['end_date']}）")
+
+    # 依目標時間排序的計時佇列；序號避免同時刻的項目互相比較
+    queue = [(job["target_time"], index, job) for index, job in enumerate(jobs)]
+    heapq.heapify(queue)
+    results = []
+    current = None
+    driver = None
+    try:
+        clock = ClockSync()
+        print("\n[同步中] 正在同步國家標準時間...")
+        clock.sync()
+        print_clock_status(clock)
+
+        print("\n[檢查中] 正在取得表單結構...")
+        schema = load_form_schema(refresh=True)
+        driver = setup_driver()
+        keeper = ConnectionKeeper(driver)
+
+        while queue:
+            _, _, current = heapq.heappop(queue)
+            results.append(run_batch_job(driver, clock, current, schema, keeper))
+            current = None
+            save_json_file(results_path, {"config": os.path.abspath(config_path), "results": results})
+    except KeyboardInterrupt:
+        print("\n\n[中斷] 使用者中斷程式")
+    except Exception as e:
+        print(f"\n[錯誤] 批次執行錯誤: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        if current is not None:
+            results.append(batch_result(current, "canceled"))
+        results.extend(batch_result(job, "canceled") for _, _, job in sorted(queue))
+        save_json_file(results_path, {"config": os.path.abspath(config_path), "results": results})
+        print(f"\n[結果] 已寫入 {results_path}")
+        for result in results:
+            print(f"  {result['name']}：{result['status']}")
+        if driver:
+            driver.quit()
+            print("[關閉] 瀏覽器已關閉")
+
+    return 0 if results and all(result["status"] == "submitted" for result in results) else 1
+
+# ==================== 本機模擬表單 ====================
+
+# 模擬表單的題目：(entry ID, 標題, 題型, 選項)，題型代碼同 QUESTION_TYPES
+MOCK_QUESTIONS = [
+    (1000001, "姓名", 0, []),
+    (1000002, "員工代號", 0, []),
+    (1000003, "請假類型", 2, ["近假", "長假"]),
+    (1000004, "假別", 3, ["特休", "事假", "病假"]),
+    (1000005, "請假起點日期", 9, []),
+    (1000006, "請假終點日期", 9, []),
+    (1000007, "確認事項", 4, ["我確認了以上資料皆正確"]),
+    (1000008, "請假密碼", 0, []),
+]
+
+# 模擬表單頁面：與 Google 表單相同的 role、aria-label 與 data-params 結構，
+# 點擊「提交」時以 POST 送到 formResponse
+MOCK_FORM_PAGE = r"""<!DOCTYPE html>
+<html lang="zh-TW"><head><meta charset="utf-8"><title>請假表單（模擬）</title>
+<style>
+[role=radio], [role=checkbox], [role=option], [role=listbox], [role=button] {
+    display: inline-block; padding: 6px 10px; margin: 4px; border: 1px solid #999; cursor: pointer;
+}
+[aria-checked=true], [aria-selected=true] { background: #cde; }
+.popup[hidden] { display: none; }
+</style></head><body>
+<form id="mock-form" onsubmit="return false">__QUESTIONS__
+<div role="button"><span>提交</span></div>
+</form>
+<script>
+document.addEventListener('click', function (event) {
+    var target = event.target;
+    var option = target.closest('[role=option]');
+    if (option) {
+        var dropdown = option.closest('.dropdown');
+        dropdown.querySelectorAll('[role=option]').forEach(function (el) {
+            el.setAttribute('aria-selected', el === option ? 'true' : 'false');
+        });
+        var listbox = dropdown.querySelector('[role=listbox]');
+        listbox.querySelector('span').textContent = option.getAttribute('data-value');
+        listbox.setAttribute('aria-expanded', 'false');
+        dropdown.querySelector('.popup').hidden = true;
+        return;
+    }
+    var listbox = target.closest('[role=listbox]');
+    if (listbox) {
+        var expanded = listbox.getAttribute('aria-expanded') !== 'true';
+        listbox.setAttribute('aria-expanded', expanded ? 'true' : 'false');
+        listbox.closest('.dropdown').querySelector('.popup').hidden = !expanded;
+        return;
+    }
+    var radio = target.closest('[role=radio]');
+    if (radio) {
+        radio.closest('[role=radiogroup]').querySelectorAll('[role=radio]').forEach(function (el) {
+            el.setAttribute('aria-checked', el === radio ? 'true' : 'false');
+        });
+        return;
+    }
+    var checkbox = target.closest('[role=checkbox]');
+    if (checkbox) {
+        checkbox.setAttribute('aria-checked', checkbox.getAttribute('aria-checked') === 'true' ? 'false' : 'true');
+        return;
+    }
+    if (target.closest('[role=button]')) {
+        submitForm();
+    }
+});
+
+function submitForm() {
+    var form = document.createElement('form');
+    form.method = 'POST';
+    form.action = 'formResponse';
+    function add(name, value) {
+        var input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = name;
+        input.value = value;
+        form.appendChild(input);
+    }
+    document.querySelectorAll('[role=listitem]').forEach(function (item) {
+        var name = 'entry.' + item.getAttribute('data-entry');
+        item.querySelectorAll('input[type=text], input[type=password]').forEach(function (el) {
+            add(name, el.value);
+        });
+        item.querySelectorAll('input[type=date]').forEach(function (el) {
+            if (el.value) {
+                var parts = el.value.split('-');
+                add(name + '_year', String(Number(parts[0])));
+                add(name + '_month', String(Number(parts[1])));
+                add(name + '_day', String(Number(parts[2])));
+            }
+        });
+        item.querySelectorAll('[aria-checked=true], [aria-selected=true]').forEach(function (el) {
+            add(name, el.getAttribute('data-value'));
+        });
+    });
+    add('fvv', '1');
+    add('pageHistory', '0');
+    document.body.appendChild(form);
+    form.submit();
+}
+</script>
+<script>var FB_PUBLIC_LOAD_DATA_ = __LOAD_DATA__;</script>
+</body></html>
+"""
+
+def render_mock_question(entry_id, title, question_type, options):
+    """產生模擬表單單一題目的 HTML"""
+    params = f'%.@.[{entry_id},"{title}",null,{question_type},[[{entry_id},null,1]]]'
+    if question_type == 2:
+        body = '<div role="radiogroup">' + "".join(
+            f'<div role="radio" data-value="{option}" aria-checked="false"><span>{option}</span></div>'
+            for option in options) + '</div>'
+    elif question_type == 3:
+        body = ('<div class="dropdown"><div role="listbox" aria-expanded="false"><span>選擇</span></div>'
+                '<div class="popup" hidden>' + "".join(
+                    f'<div role="option" data-value="{option}" aria-selected="false"><span>{option}</span></div>'
+                    for option in options) + '</div></div>')
+    elif question_type == 4:
+        body = "".join(f'<div role="checkbox" data-value="{option}" aria-checked="false"><span>{option}</span></div>'
+                       for option in options)
+    elif question_type == 9:
+        body = f'<input type="date" aria-label="{title}">'
+    else:
+        input_type = "password" if "密碼" in title else "text"
+        body = f'<input type="{input_type}" aria-label="{title}">'
+    return (f'\n<div role="listitem" data-entry="{entry_id}" data-params=\'{params}\'>'
+            f'<div role="heading">{title}</div>{body}</div>')
+
+def render_mock_form_page():
+    """產生模擬表單頁面（含 FB_PUBLIC_LOAD_DATA_ 表單結構）"""
+    items = [[entry_id, title, None, question_type, [[entry_id, [[option] for option in options] or None, 1]]]
+             for entry_id, title, question_type, options in MOCK_QUESTIONS]
+    load_data = json.dumps([None, [None, items]], ensure_ascii=False)
+    questions = "".join(render_mock_question(*question) for question in MOCK_QUESTIONS)
+    return MOCK_FORM_PAGE.replace("__QUESTIONS__", questions).replace("__LOAD_DATA__", load_data)
+
+class MockFormServer:
+    """本機模擬 Google 表單，供效能測試使用
+
+    提供與真實表單結構相同的頁面並接受 formResponse 送出，記錄每次送出抵達伺服器的時間；
+    每個請求在抵達與回應前各加入 latency_ms ± jitter_ms 的延遲，模擬網路單程延遲。
+    """
+
+    FORM_PATH = "/forms/d/mock/viewform"
+
+    def __init__(self, latency_ms=MOCK_LATENCY_MS, jitter_ms=MOCK_JITTER_MS, port=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.port = port
+        self.page = render_mock_form_page().encode('utf-8')
+        self.submissions = []   # {arrival: 抵達時間（epoch 秒）, inbound_delay, status, fields}
+        self.httpd = None
+
+    @property
+    def form_url(self):
+        return f"http://127.0.0.1:{self.port}{self.FORM_PATH}"
+
+    def delay(self):
+        """模擬一次單程網路延遲，回傳延遲的秒數"""
+        import random
+
+        seconds = max(0.0, (self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+        if seconds > 0:
+            time.sleep(seconds)
+        return seconds
+
+    def handle_submission(self, body, inbound_delay=0.0):
+        """記錄一次送出，回傳 (HTTP 狀態碼, 回應頁面, 抵達時間)
+
+        inbound_delay 為這個請求被注入的單程延遲（秒），用來推算本機端的送出延遲
+        """
+        from urllib.parse import parse_qs
+
+        arrival = time.time()
+        fields = {name: values[0] for name, values in parse_qs(body.decode('utf-8')).items()}
+        required = []
+        for entry_id, _, question_type, _ in MOCK_QUESTIONS:
+            if question_type == 9:
+                required.extend(f"entry.{entry_id}_{part}" for part in ("year", "month", "day"))
+            else:
+                required.append(f"entry.{entry_id}")
+        complete = all(fields.get(name) for name in required)
+        status = 200 if complete else 400
+        self.submissions.append({"arrival": arrival, "inbound_delay": inbound_delay,
+                                 "status": status, "fields": fields})
+        message = SUCCESS_MARKERS[-1] if complete else "必填欄位未填寫"
+        return status, f"<html><body><p>{message}</p></body></html>".encode('utf-8'), arrival
+
+    def start(self):
+        """在背景執行緒啟動伺服器"""
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def respond(self, status, content, head=False, arrival=None):
+                server.delay()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(content)))
+                if arrival is not None:
+                    self.send_header("X-Request-Time", f"{arrival:.6f}")
+                self.end_headers()
+                if not head:
+                    self.wfile.write(content)
+
+            def do_GET(self, head=False):
+                server.delay()
+                if urlsplit(self.path).path == server.FORM_PATH:
+                    self.respond(200, server.page, head)
+                else:
+                    self.respond(404, b"not found", head)
+
+            def do_HEAD(self):
+                self.do_GET(head=True)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                inbound_delay = server.delay()
+                if urlsplit(self.path).path.endswith("/formResponse"):
+                    status, content, arrival = server.handle_submission(body, inbound_delay)
+                    self.respond(status, content, arrival=arrival)
+                else:
+                    self.respond(404, b"not found")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """關閉伺服器"""
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+def run_mock_server(latency_ms=MOCK_LATENCY_MS, jitter_ms=MOCK_JITTER_MS):
+    """啟動模擬表單供手動測試，按 Ctrl+C 結束"""
+    server = MockFormServer(latency_ms, jitter_ms).start()
+    print(f"[模擬] 表單網址: {server.form_url}（延遲 {latency_ms} ± {jitter_ms} ms），按 Ctrl+C 結束")
+    try:
+        while True:
+            time.sleep(1)
+            while server.submissions:
+                submission = server.submissions.pop(0)
+                arrival = datetime.fromtimestamp(submission["arrival"])
+                print(f"[模擬] {arrival.strftime('%H:%M:%S.%f')[:-3]} 收到送出（HTTP {submission['status']}）")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+@contextmanager
+def mock_data_paths():
+    """模擬執行期間把選擇器快取與執行紀錄改寫到暫存目錄，結束後恢復並刪除
+
+    避免模擬表單的選擇器與送出紀錄混進正式執行使用的 ~/.leave_app
+    """
+    global RUN_LOG_PATH, SELECTOR_CACHE_PATH
+    saved = RUN_LOG_PATH, SELECTOR_CACHE_PATH
+    with tempfile.TemporaryDirectory(prefix="leave_app_mock_") as directory:
+        RUN_LOG_PATH = os.path.join(directory, "run_log.jsonl")
+        SELECTOR_CACHE_PATH = os.path.join(directory, "selector_cache.json")
+        try:
+            yield directory
+        finally:
+            RUN_LOG_PATH, SELECTOR_CACHE_PATH = saved
+
+def run_mock_submission(driver, server, clock, schema, start_date, end_date, use_http=True):
+    """在模擬表單上完整執行一次填寫與定時送出
+
+    回傳各項量測（毫秒）：填寫耗時、送達誤差、送出延遲、本機送出延遲（觸發到請求抵達，
+    扣除注入的網路延遲）與點擊到發出請求的延遲；失敗時回傳 None
+    """
+    server.submissions.clear()
+    TELEMETRY.start_run()
+    try:
+        fill_start = time.perf_counter()
+        if not fill_form(driver, start_date, end_date, server.form_url, schema):
+            print("[警告] 表單填寫失敗，略過本次")
+            return None
+        fill_ms = (time.perf_counter() - fill_start) * 1000
+
+        submitter = prepare_http_submitter(start_date, end_date, server.form_url, schema) if use_http else None
+        target_time = clock.now() + timedelta(seconds=E2E_TARGET_DELAY)
+        wait_and_submit(driver, target_time, submitter, clock, server.form_url)
+    finally:
+        DIAGNOSTICS.wait()
+        spans = TELEMETRY.discard()
+
+    if not server.submissions:
+        print("[警告] 模擬伺服器未收到送出")
+        return None
+    if len(server.submissions) > 1:
+        print(f"[警告] 模擬伺服器收到 {len(server.submissions)} 次送出")
+    submission = server.submissions[0]
+
+    meta = {span["name"]: span["meta"] for span in spans}
+    lead = meta.get("latency.calibrate", {}).get("lead_ms", 0) / 1000
+    fire_error = meta.get("fire", {}).get("fire_error_us", 0) / 1e6
+    fired_at = target_time.timestamp() - lead + fire_error
+    return {
+        "engine": "browser" if "submit.click" in meta else "http",
+        "fill_ms": fill_ms,
+        "arrival_error_ms": (submission["arrival"] - target_time.timestamp()) * 1000,
+        "submit_ms": sum(span["duration_ms"] for span in spans if span["name"].startswith("submit.")),
+        "send_overhead_ms": (submission["arrival"] - submission["inbound_delay"] - fired_at) * 1000,
+        "click_to_request_ms": meta.get("submit.confirm", {}).get("click_to_request_ms"),
+    }
+
+def print_latency_stats(labels, samples):
+    """顯示各項量測的 p50 / p95 / 最大值（毫秒）"""
+    for key, label in labels.items():
+        values = samples.get(key)
+        if values:
+            print(f"  {label}：p50 {percentile(values, 50):+.1f} ms / "
+                  f"p95 {percentile(values, 95):+.1f} ms / 最大 {max(values, key=abs):+.1f} ms")
+
+def benchmark_end_to_end(runs=3, latency_ms=MOCK_LATENCY_MS, jitter_ms=MOCK_JITTER_MS):
+    """以本機模擬表單完整執行填寫與定時送出，統計填寫耗時、送達誤差與送出延遲
+
+    送達誤差為伺服器收到送出的時間減去目標時間；時鐘使用本機時間，與模擬伺服器一致
+    """
+    print(f"[測試] 端對端效能測試（{runs} 次，模擬延遲 {latency_ms} ± {jitter_ms} ms）")
+    server = MockFormServer(latency_ms, jitter_ms).start()
+    start_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+    end_date = (datetime.now() + timedelta(days=2)).strftime("%Y-%m-%d")
+    clock = ClockSync(servers=[])
+    results = {"fill_ms": [], "arrival_error_ms": [], "submit_ms": []}
+    driver = None
+    with mock_data_paths():
+        try:
+            schema = fetch_form_schema(server.form_url)
+            driver = setup_driver()
+            for run in range(1, runs + 1):
+                print(f"\n[測試] 第 {run}/{runs} 次")
+                result = run_mock_submission(driver, server, clock, schema, start_date, end_date)
+                if result is not None:
+                    for key in results:
+                        results[key].append(result[key])
+        finally:
+            if driver:
+                driver.quit()
+            server.stop()
+
+    print(f"\n[結果] 成功 {len(results['fill_ms'])}/{runs} 次：")
+    print_latency_stats({"fill_ms": "填寫耗時", "arrival_error_ms": "送達誤差", "submit_ms": "送出延遲"}, results)
+    return results
+
+# ==================== 預演與效能設定檔 ====================
+
+def load_latency_profile():
+    """讀取預演產生的效能設定檔，沒有時回傳 None"""
+    return load_json_file(LATENCY_PROFILE_PATH) or None
+
+def get_prepare_before(profile, launch=True):
+    """依效能設定檔決定送出前幾秒開始準備（launch 為 True 時包含啟動瀏覽器），沒有設定檔時回傳 None"""
+    if not profile or "fill_ms" not in profile:
+        return None
+    needed_ms = profile["fill_ms"]["p95"]
+    if launch and "launch_ms" in profile:
+        needed_ms += profile["launch_ms"]["p95"]
+    return max(PREPARE_MIN_SECONDS, needed_ms / 1000 * PREPARE_SAFETY_FACTOR)
+
+def get_send_overhead(profile, engine):
+    """效能設定檔中該送出方式從觸發到請求抵達的本機延遲（秒），沒有資料時回傳 0"""
+    stats = (profile or {}).get(f"{engine}_overhead_ms")
+    return max(stats["p50"], 0) / 1000 if stats else 0.0
+
+def rehearse(runs=REHEARSAL_RUNS, latency_ms=MOCK_LATENCY_MS, jitter_ms=MOCK_JITTER_MS):
+    """預演：以本機模擬表單重複完整流程（啟動瀏覽器、填寫、等待、送出）
+
+    量測這台電腦的啟動、填寫、點擊到發出請求的延遲與觸發誤差，存成效能設定檔；
+    正式執行時依此決定何時開始準備，以及送出要再提前多少
+    """
+    print(f"[預演] 以本機模擬表單預演 {runs} 次（模擬延遲 {latency_ms} ± {jitter_ms} ms）")
+    server = MockFormServer(latency_ms, jitter_ms).start()
+    start_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+    end_date = (datetime.now() + timedelta(days=2)).strftime("%Y-%m-%d")
+    clock = ClockSync(servers=[])
+    samples = {key: [] for key in ("launch_ms", "fill_ms", "arrival_error_ms",
+                                   "http_overhead_ms", "browser_overhead_ms", "click_to_request_ms")}
+    with mock_data_paths():
+        try:
+            schema = fetch_form_schema(server.form_url)
+            for run in range(1, runs + 1):
+                # 輪流以 HTTP 與瀏覽器點擊送出，兩種方式的延遲都量測
+                use_http = run % 2 == 1
+                print(f"\n[預演] 第 {run}/{runs} 次（{'HTTP' if use_http else '瀏覽器'}送出）")
+                launch_start = time.perf_counter()
+                driver = setup_driver()
+                launch_ms = (time.perf_counter() - launch_start) * 1000
+                try:
+                    result = run_mock_submission(driver, server, clock, schema, start_date, end_date, use_http)
+                finally:
+                    driver.quit()
+                if result is None:
+                    continue
+                samples["launch_ms"].append(launch_ms)
+                samples["fill_ms"].append(result["fill_ms"])
+                samples["arrival_error_ms"].append(result["arrival_error_ms"])
+                samples[f"{result['engine']}_overhead_ms"].append(result["send_overhead_ms"])
+                if result["click_to_request_ms"] is not None:
+                    samples["click_to_request_ms"].append(result["click_to_request_ms"])
+        finally:
+            server.stop()
+
+    if not samples["launch_ms"]:
+        print("\n[錯誤] 預演沒有成功完成任何一次，未更新效能設定檔")
+        return None
+
+    profile = {
+        "updated": datetime.now().isoformat(timespec='seconds'),
+        "runs": len(samples["launch_ms"]),
+        "mock_latency_ms": latency_ms,
+        "mock_jitter_ms": jitter_ms,
+    }
+    for key, values in samples.items():
+        if values:
+            profile[key] = {"p50": round(percentile(values, 50), 3),
+                            "p95": round(percentile(values, 95), 3),
+                            "samples": len(values)}
+    save_json_file(LATENCY_PROFILE_PATH, profile)
+
+    print(f"\n[結果] 成功 {profile['runs']}/{runs} 次：")
+    print_latency_stats({
+        "launch_ms": "啟動瀏覽器",
+        "fill_ms": "填寫表單",
+        "click_to_request_ms": "點擊到發出請求",
+        "http_overhead_ms": "HTTP 本機送出延遲",
+        "browser_overhead_ms": "瀏覽器本機送出延遲",
+        "arrival_error_ms": "觸發誤差（送達 - 目標）",
+    }, samples)
+    print(f"\n[成功] 效能設定檔已儲存至 {LATENCY_PROFILE_PATH}")
+    print(f"[提示] 正式執行時將於送出前 {get_prepare_before(profile):.0f} 秒開始準備，"
+          f"送出再提前 HTTP {get_send_overhead(profile, 'http') * 1000:.1f} ms／"
+          f"瀏覽器 {get_send_overhead(profile, 'browser') * 1000:.1f} ms")
+    return profile
 
 # ==================== 主程式 ====================
 
@@ -635,7 +3997,78 @@ def main():
             time.sleep(1)
             print("\n" * 2)
 
+def build_arg_parser():
+    """建立命令列參數解析器"""
+    parser = argparse.ArgumentParser(description="線上請假自動填寫工具")
+    parser.add_argument("--config", metavar="FILE",
+                        help="依設定檔（JSON／TOML）排程多筆送出，不進入互動選單")
+    parser.add_argument("--bench-timer", type=int, nargs='?', const=200, metavar="N",
+                        help="測量精確計時器的觸發誤差（預設 200 次）")
+    parser.add_argument("--critical", action='store_true',
+                        help="搭配 --bench-timer，比較一般狀態與關鍵時段的觸發誤差")
+    parser.add_argument("--selector-cache", choices=["show", "reset"],
+                        help="查看或清除欄位選擇器快取")
+    parser.add_argument("--form-schema", action='store_true',
+                        help="重新取得並顯示表單結構與欄位對應")
+    parser.add_argument("--startup-profile", action='store_true',
+                        help="顯示啟動與各套件載入耗時")
+    parser.add_argument("--bench-browser", type=int, nargs='?', const=3, metavar="N",
+                        help="比較一般與精簡瀏覽器模式的頁面就緒時間與記憶體（預設各 3 次）")
+    parser.add_argument("--self-check-orchestrator", type=int, nargs='?', const=3, metavar="N",
+                        help="注入緩慢背景工作，確認非同步協調不會延誤觸發（預設各 3 次）")
+    parser.add_argument("--bench-e2e", type=int, nargs='?', const=3, metavar="N",
+                        help="以本機模擬表單測試填寫、定時送出與送出延遲（預設 3 次）")
+    parser.add_argument("--rehearse", type=int, nargs='?', const=REHEARSAL_RUNS, metavar="N",
+                        help=f"以本機模擬表單預演並儲存這台電腦的效能設定檔（預設 {REHEARSAL_RUNS} 次）")
+    parser.add_argument("--mock-server", action='store_true',
+                        help="啟動本機模擬表單供手動測試")
+    parser.add_argument("--mock-latency", type=float, default=MOCK_LATENCY_MS, metavar="MS",
+                        help=f"模擬表單每個請求的單程延遲（預設 {MOCK_LATENCY_MS} ms）")
+    parser.add_argument("--mock-jitter", type=float, default=MOCK_JITTER_MS, metavar="MS",
+                        help=f"模擬表單延遲的抖動範圍（預設 ±{MOCK_JITTER_MS} ms）")
+    parser.add_argument("--telemetry-summary", type=int, nargs='?', const=0, metavar="N",
+                        help="彙整過去執行的各階段耗時 p50/p95（N 為最近幾次，預設全部）")
+    return parser
+
+def run_command(args):
+    """執行命令列指令，未指定任何指令時回傳 None（進入互動選單）"""
+    if args.config:
+        return run_batch(args.config)
+    if args.bench_timer is not None:
+        benchmark_scheduler(args.bench_timer, critical=args.critical)
+        return 0
+    if args.selector_cache:
+        manage_selector_cache(args.selector_cache)
+        return 0
+    if args.form_schema:
+        show_form_schema()
+        return 0
+    if args.startup_profile:
+        startup_profile()
+        return 0
+    if args.bench_browser is not None:
+        benchmark_browser(args.bench_browser)
+        return 0
+    if args.self_check_orchestrator is not None:
+        return 0 if self_check_orchestrator(args.self_check_orchestrator) else 1
+    if args.bench_e2e is not None:
+        benchmark_end_to_end(args.bench_e2e, args.mock_latency, args.mock_jitter)
+        return 0
+    if args.rehearse is not None:
+        return 0 if rehearse(args.rehearse, args.mock_latency, args.mock_jitter) else 1
+    if args.mock_server:
+        run_mock_server(args.mock_latency, args.mock_jitter)
+        return 0
+    if args.telemetry_summary is not None:
+        summarize_telemetry(args.telemetry_summary)
+        return 0
+    return None
+
 if __name__ == "__main__":
+    exit_code = run_command(build_arg_parser().parse_args())
+    if exit_code is not None:
+        sys.exit(exit_code)
+
     try:
         main()
     except KeyboardInterrupt: